@@ -3,18 +3,24 @@
 import carla
 import random
 import time
-import cv2
 import numpy as np
 import requests
+import requests.adapters
 import os
 import threading
 from flask import Flask, jsonify, Response, abort, request
 from flask_cors import CORS
 import argparse 
+import collections
+import functools
+import gzip
+import io
+import json
 import tempfile
 import wave
-import struct 
 from dotenv import load_dotenv
+from frame_store import FrameStore
+from video_stream import JPEG_QUALITY, MJPEG_MIMETYPE, VariantCache, encode_jpeg, mjpeg_part, stream_params
 load_dotenv()
 
 EXPRESS_HTTP_URL = "http://localhost:5000"
@@ -79,301 +85,1209 @@ def get_audio_category_from_speed(speed_kmh, previous_speed=0.0):
     else:
         return 'high_speed'
 
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg')
+CATALOG_REFRESH_INTERVAL = 30.0
+
+class AudioCatalog:
+    def __init__(self, root, category_folders=AUDIO_CATEGORY_FOLDERS, category_keywords=AUDIO_CATEGORY_KEYWORDS,
+                 refresh_interval=CATALOG_REFRESH_INTERVAL):
+        self.root = root
+        self.category_folders = category_folders
+        self.category_keywords = category_keywords
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.dir_mtimes = {}
+        self.dir_files = {}
+        self.dir_subdirs = {}
+        self.categories = {}
+        self.last_check = 0.0
+        self.refresh()
+
+    def _scan_dir(self, path):
+        files, subdirs = [], []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                # Like os.walk: symlinks to directories are not followed, so
+                # a link loop cannot recurse forever
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_dir():
+                    continue
+                elif entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    files.append(entry.path)
+        return files, subdirs
+
+    def refresh(self):
+        # Only directories whose mtime changed are listed again
+        changed = False
+        seen = set()
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            seen.add(path)
+            if self.dir_mtimes.get(path) != mtime:
+                try:
+                    files, subdirs = self._scan_dir(path)
+                except OSError:
+                    continue
+                self.dir_mtimes[path] = mtime
+                self.dir_files[path] = files
+                self.dir_subdirs[path] = subdirs
+                changed = True
+            stack.extend(self.dir_subdirs.get(path, []))
+
+        for path in set(self.dir_mtimes) - seen:
+            del self.dir_mtimes[path]
+            del self.dir_files[path]
+            del self.dir_subdirs[path]
+            changed = True
+
+        if changed or not self.categories:
+            self._rebuild()
+        self.last_check = time.time()
+        return changed
+
+    def _rebuild(self):
+        all_files = [f for files in self.dir_files.values() for f in files]
+        categories = {}
+        for category in set(self.category_folders) | set(self.category_keywords):
+            matching = []
+            for folder_name in self.category_folders.get(category, []):
+                prefix = os.path.join(self.root, folder_name)
+                for path, files in self.dir_files.items():
+                    if path == prefix or path.startswith(prefix + os.sep):
+                        matching.extend(files)
+            if not matching:
+                keywords = [k.lower() for k in self.category_keywords.get(category, [])]
+                matching = [f for f in all_files if any(k in os.path.basename(f).lower() for k in keywords)]
+            categories[category] = tuple(sorted(matching))
+        self.categories = categories
+        counts = {category: len(files) for category, files in sorted(categories.items())}
+        print(f"INFO: Audio catalog indexed {len(all_files)} files in {len(self.dir_files)} folders: {counts}")
+
+    def pick(self, category):
+        if time.time() - self.last_check >= self.refresh_interval:
+            with self.lock:
+                if time.time() - self.last_check >= self.refresh_interval:
+                    self.refresh()
+        files = self.categories.get(category)
+        if not files:
+            return None
+        return files[random.randrange(len(files))]
+
+audio_catalog = None
+audio_catalog_lock = threading.Lock()
+
+def get_audio_catalog():
+    global audio_catalog
+    if audio_catalog is None:
+        with audio_catalog_lock:
+            if audio_catalog is None:
+                if not os.path.exists(AUDIO_DATASET_PATH):
+                    print(f"WARNING: Audio dataset path does not exist: {AUDIO_DATASET_PATH}")
+                audio_catalog = AudioCatalog(AUDIO_DATASET_PATH)
+    return audio_catalog
+
 def find_audio_file_from_dataset(category):
-    if not os.path.exists(AUDIO_DATASET_PATH):
-        print(f"WARNING: Audio dataset path does not exist: {AUDIO_DATASET_PATH}")
-        return None
+    return get_audio_catalog().pick(category)
 
-    audio_extensions = ['.wav', '.mp3', '.m4a', '.flac', '.ogg']
-    matching_files = []
-
-    category_folders = AUDIO_CATEGORY_FOLDERS.get(category, [])
-    print(f"DEBUG: Searching in category folders for '{category}': {category_folders}")
-    if category_folders:
-        for folder_name in category_folders:
-            folder_path = os.path.join(AUDIO_DATASET_PATH, folder_name)
-            if os.path.exists(folder_path) and os.path.isdir(folder_path):
-                print(f"DEBUG: Searching in folder: {folder_path}")
-                for root, dirs, files in os.walk(folder_path):
-                    for file in files:
-                        file_lower = file.lower()
-                        if any(file_lower.endswith(ext) for ext in audio_extensions):
-                            matching_files.append(os.path.join(root, file))
-
-    if not matching_files:
-        keywords = AUDIO_CATEGORY_KEYWORDS.get(category, [])
-        print(f"DEBUG: No files found in category folders. Trying keyword matching: {keywords}")
-        if keywords:
-            for root, dirs, files in os.walk(AUDIO_DATASET_PATH):
-                for file in files:
-                    file_lower = file.lower()
-                    if any(file_lower.endswith(ext) for ext in audio_extensions):
-                        for keyword in keywords:
-                            if keyword.lower() in file_lower:
-                                matching_files.append(os.path.join(root, file))
-                                break
-
-    if matching_files:
-        selected_file = random.choice(matching_files)
-        print(f"DEBUG: Found {len(matching_files)} audio files for category '{category}', selected: {os.path.basename(selected_file)}")
-        return selected_file
-
-    print(f"WARNING: No audio files found for category '{category}' in dataset path: {AUDIO_DATASET_PATH}")
-    return None
+SPEED_BUCKET_KMH = 1.0
+audio_rng = np.random.default_rng()
+
+@functools.lru_cache(maxsize=256)
+def synth_tone(speed_bucket, duration, sample_rate):
+    speed_kmh = speed_bucket * SPEED_BUCKET_KMH
+    base_freq = 200 + (speed_kmh / 100.0) * 600
+    amplitude = 0.3 + min(speed_kmh / 100.0, 0.7)
+    phase = 2 * np.pi * base_freq * np.arange(int(sample_rate * duration)) / sample_rate
+    tone = amplitude * (np.sin(phase) + 0.3 * np.sin(2 * phase) + 0.2 * np.sin(3 * phase))
+    tone.flags.writeable = False
+    return tone, amplitude
 
 def generate_audio_from_speed(speed_kmh, duration=2.0, sample_rate=16000):
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-    temp_path = temp_file.name
-    temp_file.close()
-    
     try:
-        num_samples = int(sample_rate * duration)
-        base_freq = 200 + (speed_kmh / 100.0) * 600
-        amplitude = 0.3 + min(speed_kmh / 100.0, 0.7)
-        
-        with wave.open(temp_path, 'w') as wav_file:
+        tone, amplitude = synth_tone(int(round(speed_kmh / SPEED_BUCKET_KMH)), duration, sample_rate)
+        noise = audio_rng.random(len(tone)) - 0.5
+        samples = np.clip(tone + 0.1 * amplitude * noise, -1.0, 1.0)
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
             wav_file.setnchannels(1)
             wav_file.setsampwidth(2)
             wav_file.setframerate(sample_rate)
-            
-            for i in range(num_samples):
-                t = float(i) / sample_rate
-                value1 = amplitude * np.sin(2 * np.pi * base_freq * t)
-                value2 = 0.3 * amplitude * np.sin(2 * np.pi * base_freq * 2 * t)
-                value3 = 0.2 * amplitude * np.sin(2 * np.pi * base_freq * 3 * t)
-                noise = 0.1 * amplitude * (random.random() - 0.5)
-                
-                sample = value1 + value2 + value3 + noise
-                sample = max(-1.0, min(1.0, sample))
-                sample_int = int(sample * 32767)
-                wav_file.writeframes(struct.pack('<h', sample_int))
-        
-        return temp_path
+            wav_file.writeframes((samples * 32767).astype('<i2').tobytes())
+        return buffer.getvalue()
     except Exception as e:
         print(f"ERROR: Failed to generate audio: {e}")
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
         return None
 
-def upload_audio_to_express(car_id, speed_kmh=0.0, previous_speed=0.0, stuck_duration=0):
-    if speed_kmh < MIN_SPEED_FOR_AUDIO and stuck_duration < 30:
-        return
-
-    audio_path = None
-    is_temp_file = False
+AUDIO_MIME_TYPES = {
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.m4a': 'audio/mp4',
+    '.flac': 'audio/flac',
+    '.ogg': 'audio/ogg'
+}
 
-    try:
-        if stuck_duration >= 30:
-            category = 'collision'
-        else:
-            category = get_audio_category_from_speed(speed_kmh, previous_speed)
-
-        audio_path = find_audio_file_from_dataset(category)
-        print("audio_path",audio_path)
-        if audio_path:
-            print(f"INFO: [{car_id}] Using dataset audio file: {os.path.basename(audio_path)} (category: {category})")
-            audio_dir = os.path.dirname(audio_path)
-            print(f"DEBUG: Selected audio file directory: {audio_dir}")
-        else:
-            print(f"WARNING: [{car_id}] No dataset audio found for category '{category}', generating fallback audio")
-            audio_path = generate_audio_from_speed(speed_kmh)
-            is_temp_file = True
-            if not audio_path:
-                print(f"ERROR: [{car_id}] Could not generate fallback audio file")
-                return
+def build_audio_upload(car_id, speed_kmh=0.0, previous_speed=0.0, stuck_duration=0):
+    if stuck_duration >= STUCK_COLLISION_SECONDS:
+        category = 'collision'
+    else:
+        category = get_audio_category_from_speed(speed_kmh, previous_speed)
 
+    audio_path = find_audio_file_from_dataset(category)
+    if audio_path:
+        print(f"INFO: [{car_id}] Using dataset audio file: {os.path.basename(audio_path)} (category: {category})")
         file_ext = os.path.splitext(audio_path)[1].lower()
-        mime_types = {
-            '.wav': 'audio/wav',
-            '.mp3': 'audio/mpeg',
-            '.m4a': 'audio/mp4',
-            '.flac': 'audio/flac',
-            '.ogg': 'audio/ogg'
-        }
-        mime_type = mime_types.get(file_ext, 'audio/wav')
-
         with open(audio_path, 'rb') as f:
             audio_bytes = f.read()
+    else:
+        print(f"WARNING: [{car_id}] No dataset audio found for category '{category}', generating fallback audio")
+        file_ext = '.wav'
+        audio_bytes = generate_audio_from_speed(speed_kmh)
+        if not audio_bytes:
+            print(f"ERROR: [{car_id}] Could not generate fallback audio")
+            return None
+
+    mime_type = AUDIO_MIME_TYPES.get(file_ext, 'audio/wav')
+    return {
+        'files': {'audio': (f'{car_id}_event{file_ext}', audio_bytes, mime_type)},
+        'data': {'carId': car_id},
+    }
+
+def log_audio_response(car_id, response):
+    if response.status_code == 200:
+        result = response.json()
+        analysis = result.get('analysis', {})
+        print(f"INFO: [{car_id}] Audio processed successfully. Prediction: {analysis.get('prediction', 'N/A')}, Confidence: {analysis.get('confidence', 0):.2f}")
+    else:
+        print(f"WARNING: [{car_id}] Audio processing returned status {response.status_code}: {response.text}")
+
+def keepalive_session():
+    session = requests.Session()
+    session.headers.update({'X-Service-Token': SERVICE_TOKEN})
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
-        filename = f'{car_id}_event{file_ext}'
-        files = {'audio': (filename, audio_bytes, mime_type)}
+def retry_delay(base_delay, attempt):
+    return base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
 
-        print(f"DEBUG: Using SERVICE_TOKEN: {SERVICE_TOKEN}")
+UPLOAD_QUEUE_SIZE = 32
+UPLOAD_WORKERS = 2
+UPLOAD_TIMEOUT = 10
+UPLOAD_MAX_ATTEMPTS = 3
+UPLOAD_RETRY_BASE_DELAY = 0.5
 
-        headers = {'X-Service-Token': SERVICE_TOKEN}
+class AudioUploader:
+    # Car threads only enqueue; a few workers with keep-alive sessions do the HTTP.
+    # When the queue is full the oldest job is dropped, since newer audio matters more.
+    def __init__(self, max_queue=UPLOAD_QUEUE_SIZE, workers=UPLOAD_WORKERS,
+                 max_attempts=UPLOAD_MAX_ATTEMPTS, retry_base_delay=UPLOAD_RETRY_BASE_DELAY):
+        self.max_queue = max_queue
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.counters = {'submitted': 0, 'uploaded': 0, 'failed': 0, 'dropped': 0, 'retries': 0}
+        self.latencies = collections.deque(maxlen=256)
+
+    def start(self):
+        with self.condition:
+            if self.threads:
+                return
+            self.stop_event.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"AudioUploader-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        print(f"INFO: Audio uploader started with {self.workers} workers (queue size {self.max_queue})")
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+            threads, self.threads = self.threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, car_id, speed_kmh=0.0, previous_speed=0.0, stuck_duration=0):
+        with self.condition:
+            if len(self.queue) >= self.max_queue:
+                dropped = self.queue.popleft()
+                self.counters['dropped'] += 1
+                print(f"WARNING: Audio upload queue full, dropped oldest job for [{dropped['car_id']}]")
+            self.queue.append({
+                'car_id': car_id,
+                'speed_kmh': speed_kmh,
+                'previous_speed': previous_speed,
+                'stuck_duration': stuck_duration,
+                'enqueued_at': time.time(),
+            })
+            self.counters['submitted'] += 1
+            self.condition.notify()
+
+    def _worker(self):
+        session = keepalive_session()
+        try:
+            while True:
+                with self.condition:
+                    while not self.queue and not self.stop_event.is_set():
+                        self.condition.wait()
+                    if self.stop_event.is_set():
+                        return
+                    job = self.queue.popleft()
+                self._process(session, job)
+        finally:
+            session.close()
+
+    def _process(self, session, job):
+        car_id = job['car_id']
         if not SERVICE_TOKEN or SERVICE_TOKEN == "carla-bridge-service-token":
             print("ERROR: SERVICE_TOKEN is not set or using the default placeholder value. Please configure the SERVICE_TOKEN environment variable.")
+            self._count('failed')
             return
+        try:
+            upload = build_audio_upload(car_id, job['speed_kmh'], job['previous_speed'], job['stuck_duration'])
+        except Exception as e:
+            print(f"ERROR: [{car_id}] Error processing audio: {e}")
+            upload = None
+        if upload is None:
+            self._count('failed')
+            return
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = session.post(
+                    f"{EXPRESS_HTTP_URL}/api/ai/process-audio",
+                    files=upload['files'],
+                    data=upload['data'],
+                    timeout=UPLOAD_TIMEOUT
+                )
+                # 4xx will not succeed on retry; only server errors are retried
+                if response.status_code < 500:
+                    log_audio_response(car_id, response)
+                    self._finish(job, response.status_code == 200)
+                    return
+                error = f"status {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                error = str(e)
 
-        data = {'carId': car_id}
+            if attempt == self.max_attempts:
+                break
+            delay = retry_delay(self.retry_base_delay, attempt)
+            print(f"WARNING: [{car_id}] Audio upload attempt {attempt} failed ({error}), retrying in {delay:.2f}s")
+            self._count('retries')
+            if self.stop_event.wait(delay):
+                break
 
-        response = requests.post(
-            f"{EXPRESS_HTTP_URL}/api/ai/process-audio",
-            files=files,
-            data=data,
-            headers=headers,
-            timeout=10
-        )
+        print(f"ERROR: [{car_id}] Could not upload audio to Express backend after {attempt} attempts: {error}")
+        self._finish(job, False)
 
-        if response.status_code == 200:
-            result = response.json()
-            analysis = result.get('analysis', {})
-            print(f"INFO: [{car_id}] Audio processed successfully. Prediction: {analysis.get('prediction', 'N/A')}, Confidence: {analysis.get('confidence', 0):.2f}")
+    def _count(self, name):
+        with self.condition:
+            self.counters[name] += 1
+
+    def _finish(self, job, ok):
+        with self.condition:
+            self.counters['uploaded' if ok else 'failed'] += 1
+            self.latencies.append((time.time() - job['enqueued_at']) * 1000.0)
+
+    def stats(self):
+        with self.condition:
+            latencies = np.array(self.latencies)
+            stats = dict(self.counters)
+            stats['queue_depth'] = len(self.queue)
+            stats['max_queue'] = self.max_queue
+            stats['workers'] = len(self.threads)
+        if len(latencies):
+            stats['latency_ms'] = {
+                'p50': round(float(np.percentile(latencies, 50)), 1),
+                'p95': round(float(np.percentile(latencies, 95)), 1),
+                'max': round(float(latencies.max()), 1),
+            }
         else:
-            print(f"WARNING: [{car_id}] Audio processing returned status {response.status_code}: {response.text}")
+            stats['latency_ms'] = None
+        return stats
 
-    except requests.exceptions.RequestException as e:
-        print(f"ERROR: [{car_id}] Could not connect to Express backend for audio upload: {e}")
-    except Exception as e:
-        print(f"ERROR: [{car_id}] Error processing audio: {e}")
-    finally:
-        if is_temp_file and audio_path and os.path.exists(audio_path):
-            try:
-                os.unlink(audio_path)
-            except Exception as e:
-                print(f"WARNING: [{car_id}] Failed to delete temporary audio file: {e}")
+audio_uploader = AudioUploader()
+
+class Broadcast:
+    # Latest-value slot with a sequence number. Producers bump `seq` under the
+    # lock; consumers wait until it passes the last value they handled.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.updated = threading.Condition(self.lock)
+        self.seq = 0
+        self.closed = False
+        self.listeners = set()
+
+    def _published(self):
+        # Caller holds the lock
+        self.seq += 1
+        self.updated.notify_all()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.updated.notify_all()
+        self._notify_listeners()
+
+    def _notify_listeners(self):
+        # Listeners are called from the producer thread and must be thread-safe
+        for listener in tuple(self.listeners):
+            listener()
+
+    def wait_for_update(self, after_seq, timeout=None):
+        # Returns the newest sequence number once it is past after_seq, or None
+        # on timeout or when the source is closed
+        with self.lock:
+            self.updated.wait_for(lambda: self.closed or self.seq > after_seq, timeout)
+            if self.closed or self.seq <= after_seq:
+                return None
+            return self.seq
+
+class CameraFeed(Broadcast):
+    # Holds only the newest raw frame; JPEG encoding happens when a viewer asks
+    # for a frame newer than the last encoded one, so unwatched cameras stay cheap.
+    # Every (scale, quality) variant is encoded at most once per source frame and
+    # shared by all of its viewers; variants nobody asked for in VARIANT_TTL expire.
+    # With a frame store, each frame is also copied into `shared` for frame_server.py.
+    def __init__(self, quality=JPEG_QUALITY, shared=None):
+        super().__init__()
+        self.quality = quality
+        self.shared = shared
+        self.image = None
+        self.raw = None
+        self.variants = VariantCache()
+
+    def update(self, image):
+        # Zero-copy view over the sensor buffer; keeping `image` keeps it alive
+        raw = np.frombuffer(image.raw_data, dtype=np.uint8).reshape((image.height, image.width, 4))
+        # unregister() may clear `shared` from another thread; read it once
+        shared = self.shared
+        if shared is not None:
+            shared.write(raw)
+        with self.lock:
+            self.image = image
+            self.raw = raw
+            self._published()
+        self._notify_listeners()
+
+    def latest_jpeg(self, scale=1.0, quality=None):
+        key = (scale, quality or self.quality)
+        with self.lock:
+            variant = self.variants.get(key)
+            if variant['seq'] == self.seq:
+                return variant['seq'], variant['jpeg']
+        with variant['lock']:
+            with self.lock:
+                raw, seq = self.raw, self.seq
+                if raw is None or variant['seq'] == seq:
+                    return variant['seq'], variant['jpeg']
+            jpeg = encode_jpeg(raw, scale, key[1])
+            with self.lock:
+                if jpeg is not None:
+                    variant['jpeg'] = jpeg
+                    variant['seq'] = seq
+                return variant['seq'], variant['jpeg']
 
 def camera_callback(image, car_id, car_data, camera_type):
-    img_data = np.array(image.raw_data).reshape((image.height, image.width, 4))
-    img_bgr = img_data[:, :, :3]
-    ret, jpeg = cv2.imencode('.jpeg', img_bgr, [cv2.IMWRITE_JPEG_QUALITY, 70])
-    if ret:
-        with car_data['lock']:
-            if camera_type == 'first_person':
-                car_data['first_person_frame'] = jpeg.tobytes()
-            elif camera_type == 'third_person':
-                car_data['third_person_frame'] = jpeg.tobytes()
-
-def update_telemetry_data(car_id, car_data):
-    vehicle = car_data['vehicle']
-    transform = vehicle.get_transform()
-    velocity = vehicle.get_velocity()
+    car_data['feeds'][camera_type].update(image)
+
+STUCK_COLLISION_SECONDS = 30
+
+TELEMETRY_STREAM_RATE = 2.0
+MAX_TELEMETRY_STREAM_RATE = 50.0
+TELEMETRY_KEEPALIVE = 15.0
+TELEMETRY_RESYNC_TICKS = 10000
+
+class TelemetryBoard(Broadcast):
+    # Fleet-wide telemetry as of the last world tick. The JSON body is built once
+    # per tick and shared by every /telemetry reader, and per-car versions let
+    # push clients receive only the cars whose position or speed changed.
+    def __init__(self):
+        super().__init__()
+        self.cars = {}
+        self.versions = {}
+        self.removed = {}
+        self.timestamp = time.time()
+        self.serialized = None
+        self.serialized_seq = -1
+
+    def publish(self, cars):
+        with self.lock:
+            seq = self.seq + 1
+            for car_id, telemetry in cars.items():
+                previous = self.cars.get(car_id)
+                if previous is None or any(previous[k] != telemetry[k] for k in ('lat', 'lon', 'speed')):
+                    self.versions[car_id] = seq
+                self.removed.pop(car_id, None)
+            for car_id in self.cars.keys() - cars.keys():
+                self.versions.pop(car_id, None)
+                self.removed[car_id] = seq
+            for car_id in [c for c, v in self.removed.items() if seq - v > TELEMETRY_RESYNC_TICKS]:
+                del self.removed[car_id]
+            self.cars = cars
+            self.timestamp = time.time()
+            self._published()
+        self._notify_listeners()
+
+    def snapshot_json(self):
+        with self.lock:
+            if self.serialized_seq == self.seq:
+                return self.seq, self.serialized
+            seq, cars, timestamp = self.seq, self.cars, self.timestamp
+        body = json.dumps({"seq": seq, "timestamp": timestamp, "cars": cars})
+        with self.lock:
+            if self.seq == seq:
+                self.serialized, self.serialized_seq = body, seq
+        return seq, body
+
+    def changes_since(self, after_seq):
+        # Returns (seq, changed cars, removed car ids), or None when after_seq is
+        # too old for the removal history and the client needs a full snapshot
+        with self.lock:
+            if self.seq - after_seq > TELEMETRY_RESYNC_TICKS:
+                return None
+            changed = {car_id: self.cars[car_id] for car_id, v in self.versions.items() if v > after_seq}
+            removed = [car_id for car_id, v in self.removed.items() if v > after_seq]
+            return self.seq, changed, removed
+
+telemetry_board = TelemetryBoard()
+
+TELEMETRY_EXPORT_MAX_SAMPLES = 1000
+TELEMETRY_EXPORT_INTERVAL = 5.0
+TELEMETRY_EXPORT_BUFFER = 20000
+TELEMETRY_EXPORT_MAX_ATTEMPTS = 3
+TELEMETRY_EXPORT_RETRY_BASE_DELAY = 1.0
+TELEMETRY_SPOOL_DIR = os.getenv("TELEMETRY_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "carla_telemetry_spool"))
+TELEMETRY_SPOOL_MAX_BYTES = 50 * 1024 * 1024
+TELEMETRY_SPOOL_DRAIN_INTERVAL = 30.0
+TELEMETRY_SPOOL_MAX_FAILURES = 5
+# Fixed-point scales used by the delta encoding (ms, micro-units, 0.01 km/h)
+TELEMETRY_EXPORT_SCALES = {'t': 1000, 'lat': 1000000, 'lon': 1000000, 'speed': 100}
+
+def encode_telemetry_batch(samples):
+    # samples: [(car_id, timestamp, lat, lon, speed)]. Each car's columns become
+    # integer deltas at TELEMETRY_EXPORT_SCALES (the first entry is the absolute
+    # value, timestamps relative to t0); the JSON is then gzip-compressed.
+    t0 = min(sample[1] for sample in samples)
+    by_car = {}
+    for car_id, timestamp, lat, lon, speed in samples:
+        by_car.setdefault(car_id, []).append((timestamp - t0, lat, lon, speed))
+    cars = {}
+    for car_id, rows in by_car.items():
+        rows = np.array(sorted(rows), dtype=np.float64)
+        cars[car_id] = {
+            column: np.diff(np.round(rows[:, i] * TELEMETRY_EXPORT_SCALES[column]).astype(np.int64), prepend=0).tolist()
+            for i, column in enumerate(('t', 'lat', 'lon', 'speed'))
+        }
+    body = json.dumps({
+        "v": 1,
+        "t0": round(t0, 3),
+        "scales": TELEMETRY_EXPORT_SCALES,
+        "samples": len(samples),
+        "cars": cars
+    }, separators=(',', ':'))
+    return gzip.compress(body.encode(), compresslevel=6)
+
+# Outcomes of TelemetryExporter._send
+SEND_DELIVERED, SEND_REJECTED, SEND_SERVER_ERROR, SEND_UNREACHABLE = 'delivered', 'rejected', 'server_error', 'unreachable'
+
+def spool_file_name(created_ns, count, failures):
+    # Names sort oldest first and carry the sample count and failed drains
+    return f"{created_ns:020d}-{count}-{failures}.json.gz"
+
+def parse_spool_file_name(name):
+    created_ns, count, failures = name[:-len('.json.gz')].split('-')
+    return int(created_ns), int(count), int(failures)
+
+class TelemetryExporter:
+    # Collects sampled telemetry from every car and posts it to Express as one
+    # compressed batch when TELEMETRY_EXPORT_MAX_SAMPLES accumulate or every
+    # TELEMETRY_EXPORT_INTERVAL seconds. Batches that cannot be delivered are
+    # spooled to disk (oldest evicted past the byte limit) and re-sent every
+    # TELEMETRY_SPOOL_DRAIN_INTERVAL seconds, or as soon as Express recovers.
+    # A spooled batch Express keeps failing on is moved to a quarantine
+    # directory after TELEMETRY_SPOOL_MAX_FAILURES drains.
+    def __init__(self, url=None, max_samples=TELEMETRY_EXPORT_MAX_SAMPLES, interval=TELEMETRY_EXPORT_INTERVAL,
+                 buffer_size=TELEMETRY_EXPORT_BUFFER, spool_dir=TELEMETRY_SPOOL_DIR,
+                 spool_max_bytes=TELEMETRY_SPOOL_MAX_BYTES, max_attempts=TELEMETRY_EXPORT_MAX_ATTEMPTS,
+                 retry_base_delay=TELEMETRY_EXPORT_RETRY_BASE_DELAY, drain_interval=TELEMETRY_SPOOL_DRAIN_INTERVAL,
+                 spool_max_failures=TELEMETRY_SPOOL_MAX_FAILURES):
+        self.url = url
+        self.max_samples = max_samples
+        self.interval = interval
+        self.buffer_size = buffer_size
+        self.spool_dir = spool_dir
+        self.quarantine_dir = os.path.join(spool_dir, 'quarantine')
+        self.spool_max_bytes = spool_max_bytes
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.drain_interval = drain_interval
+        self.spool_max_failures = spool_max_failures
+        self.next_drain = 0.0
+        self.live_failed = False
+        self.buffer = collections.deque()
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.counters = {
+            'batches_sent': 0, 'samples_sent': 0, 'bytes_sent': 0, 'failures': 0, 'retries': 0,
+            'rejected_batches': 0, 'spooled_batches': 0, 'evicted_batches': 0, 'quarantined_batches': 0,
+            'dropped_samples': 0,
+        }
+
+    def start(self):
+        if self.thread is not None:
+            return
+        os.makedirs(self.quarantine_dir, exist_ok=True)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._worker, name="TelemetryExporter", daemon=True)
+        self.thread.start()
+        print(f"INFO: Telemetry exporter started (batch {self.max_samples} samples / {self.interval:g}s, spool {self.spool_dir})")
+
+    def stop(self, timeout=10.0):
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        self.thread = None
+
+    def add(self, car_id, timestamp, lat, lon, speed):
+        if self.thread is None:
+            return
+        with self.condition:
+            if len(self.buffer) >= self.buffer_size:
+                self.buffer.popleft()
+                self.counters['dropped_samples'] += 1
+            self.buffer.append((car_id, timestamp, lat, lon, speed))
+            if len(self.buffer) >= self.max_samples:
+                self.condition.notify()
+
+    def _target_url(self):
+        return self.url or f"{EXPRESS_HTTP_URL}/api/telemetry/batch"
+
+    def _worker(self):
+        session = keepalive_session()
+        try:
+            while True:
+                deadline = time.time() + self.interval
+                with self.condition:
+                    while (len(self.buffer) < self.max_samples and not self.stop_event.is_set()
+                           and time.time() < deadline):
+                        self.condition.wait(deadline - time.time())
+                stopping = self.stop_event.is_set()
+                while True:
+                    with self.condition:
+                        batch = [self.buffer.popleft() for _ in range(min(len(self.buffer), self.max_samples))]
+                    if batch:
+                        self._flush(session, batch, stopping)
+                    if stopping and self.buffer:
+                        continue
+                    if len(self.buffer) < self.max_samples:
+                        break
+                if stopping:
+                    return
+                if time.time() >= self.next_drain:
+                    self._drain_spool(session)
+                    self.next_drain = time.time() + self.drain_interval
+        finally:
+            session.close()
+
+    def _flush(self, session, samples, stopping=False):
+        try:
+            body = encode_telemetry_batch(samples)
+        except Exception as e:
+            print(f"ERROR: Could not encode telemetry batch: {e}")
+            self._count('rejected_batches')
+            return
+        result = self._send(session, body, len(samples), 1 if stopping else self.max_attempts)
+        if result in (SEND_SERVER_ERROR, SEND_UNREACHABLE):
+            print(f"WARNING: Spooling telemetry batch of {len(samples)} samples to disk")
+            self._spool(body, len(samples))
+            self.live_failed = True
+        elif result == SEND_DELIVERED and self.live_failed:
+            # Express is back: drain on the next worker pass instead of waiting for the timer
+            self.live_failed = False
+            self.next_drain = 0.0
+
+    def _send(self, session, body, count, max_attempts):
+        # SEND_REJECTED when Express refused the batch (retrying or spooling it
+        # would not help); SEND_SERVER_ERROR and SEND_UNREACHABLE after the
+        # last attempt failed with a 5xx or without a response
+        for attempt in range(1, max_attempts + 1):
+            try:
+                response = session.post(
+                    self._target_url(),
+                    data=body,
+                    headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+                    timeout=UPLOAD_TIMEOUT
+                )
+                if response.status_code < 300:
+                    with self.condition:
+                        self.counters['batches_sent'] += 1
+                        self.counters['samples_sent'] += count
+                        self.counters['bytes_sent'] += len(body)
+                    return SEND_DELIVERED
+                if response.status_code < 500:
+                    print(f"ERROR: Telemetry batch rejected with status {response.status_code}: {response.text}")
+                    self._count('rejected_batches')
+                    return SEND_REJECTED
+                result = SEND_SERVER_ERROR
+                error = f"status {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                result = SEND_UNREACHABLE
+                error = str(e)
+
+            if attempt == max_attempts:
+                break
+            self._count('retries')
+            if self.stop_event.wait(retry_delay(self.retry_base_delay, attempt)):
+                break
+
+        print(f"WARNING: Telemetry batch of {count} samples not delivered ({error})")
+        self._count('failures')
+        return result
+
+    def _spool_files(self, directory=None):
+        try:
+            entries = [e for e in os.scandir(directory or self.spool_dir)
+                       if e.is_file() and e.name.endswith('.json.gz')]
+        except OSError:
+            return []
+        return sorted(entries, key=lambda e: e.name)
+
+    def _spool(self, body, count):
+        path = os.path.join(self.spool_dir, spool_file_name(time.time_ns(), count, 0))
+        try:
+            with open(path + '.tmp', 'wb') as f:
+                f.write(body)
+            os.replace(path + '.tmp', path)
+            self._count('spooled_batches')
+        except OSError as e:
+            print(f"ERROR: Could not spool telemetry batch: {e}")
+            return
+        # Quarantined batches count towards the limit and are evicted first
+        entries = self._spool_files(self.quarantine_dir) + self._spool_files()
+        total = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if total <= self.spool_max_bytes:
+                break
+            total -= entry.stat().st_size
+            os.unlink(entry.path)
+            self._count('evicted_batches')
+
+    def _drain_spool(self, session):
+        # Oldest first. A batch that gets a 5xx is skipped so it cannot hold back
+        # the ones behind it; an unreachable server ends the drain.
+        for entry in self._spool_files():
+            if self.stop_event.is_set():
+                return
+            try:
+                created_ns, count, failures = parse_spool_file_name(entry.name)
+                with open(entry.path, 'rb') as f:
+                    body = f.read()
+            except (OSError, ValueError):
+                self._quarantine(entry)
+                continue
+            result = self._send(session, body, count, 1)
+            if result == SEND_UNREACHABLE:
+                return
+            try:
+                if result != SEND_SERVER_ERROR:
+                    os.unlink(entry.path)
+                elif failures + 1 >= self.spool_max_failures:
+                    self._quarantine(entry)
+                else:
+                    os.replace(entry.path, os.path.join(self.spool_dir, spool_file_name(created_ns, count, failures + 1)))
+            except OSError as e:
+                print(f"ERROR: Could not update spooled telemetry batch {entry.name}: {e}")
+
+    def _quarantine(self, entry):
+        # Kept for inspection; never re-sent
+        try:
+            os.replace(entry.path, os.path.join(self.quarantine_dir, entry.name))
+        except OSError as e:
+            print(f"ERROR: Could not quarantine spooled telemetry batch {entry.name}: {e}")
+            return
+        print(f"WARNING: Quarantined spooled telemetry batch {entry.name} in {self.quarantine_dir}")
+        self._count('quarantined_batches')
+
+    def _count(self, name):
+        with self.condition:
+            self.counters[name] += 1
+
+    def stats(self):
+        entries = self._spool_files()
+        with self.condition:
+            stats = dict(self.counters)
+            stats['buffered_samples'] = len(self.buffer)
+        stats['running'] = self.thread is not None
+        stats['spool_batches'] = len(entries)
+        stats['spool_bytes'] = sum(e.stat().st_size for e in entries)
+        stats['quarantine_batches'] = len(self._spool_files(self.quarantine_dir))
+        return stats
+
+telemetry_exporter = TelemetryExporter()
+
+TELEMETRY_HISTORY_DTYPE = np.dtype([
+    ('timestamp', 'f8'), ('lat', 'f8'), ('lon', 'f8'), ('speed', 'f4')
+])
+# One sample every 0.5 s for an hour: 7200 * 28 bytes (~200 KB) per car
+TELEMETRY_HISTORY_CAPACITY = 7200
+TELEMETRY_HISTORY_INTERVAL = 0.5
+HISTORY_FIELDS = ('lat', 'lon', 'speed')
+
+class TelemetryHistory:
+    # Fixed-capacity ring buffer over a preallocated structured array, so memory
+    # per car is constant and appends allocate nothing beyond the record tuple
+    def __init__(self, capacity=TELEMETRY_HISTORY_CAPACITY, interval=TELEMETRY_HISTORY_INTERVAL):
+        self.samples = np.zeros(capacity, dtype=TELEMETRY_HISTORY_DTYPE)
+        self.capacity = capacity
+        self.interval = interval
+        self.head = 0
+        self.count = 0
+        self.last_timestamp = float('-inf')
+        self.lock = threading.Lock()
+
+    def append(self, timestamp, lat, lon, speed):
+        if timestamp - self.last_timestamp < self.interval:
+            return False
+        with self.lock:
+            self.samples[self.head] = (timestamp, lat, lon, speed)
+            self.head = (self.head + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.last_timestamp = timestamp
+        return True
+
+    def range(self, start=None, end=None):
+        with self.lock:
+            if self.count < self.capacity:
+                ordered = self.samples[:self.count].copy()
+            else:
+                ordered = np.concatenate((self.samples[self.head:], self.samples[:self.head]))
+        timestamps = ordered['timestamp']
+        lo = 0 if start is None else np.searchsorted(timestamps, start, side='left')
+        hi = len(ordered) if end is None else np.searchsorted(timestamps, end, side='right')
+        return ordered[lo:hi]
+
+def downsample_history(samples, step, start=None):
+    # Buckets of `step` seconds aligned to `start`; min/max/mean per bucket via
+    # reduceat over the (already time-ordered) bucket boundaries
+    if len(samples) == 0:
+        return {"timestamp": [], "count": [], **{f: {"min": [], "max": [], "mean": []} for f in HISTORY_FIELDS}}
+    timestamps = samples['timestamp']
+    origin = timestamps[0] if start is None else start
+    buckets = np.floor((timestamps - origin) / step).astype(np.int64)
+    boundaries = np.flatnonzero(np.diff(buckets)) + 1
+    starts = np.concatenate(([0], boundaries))
+    counts = np.diff(np.concatenate((starts, [len(samples)])))
+    result = {
+        "timestamp": (origin + buckets[starts] * step).round(3).tolist(),
+        "count": counts.tolist(),
+    }
+    for field in HISTORY_FIELDS:
+        values = samples[field].astype(np.float64)
+        result[field] = {
+            "min": np.minimum.reduceat(values, starts).round(6).tolist(),
+            "max": np.maximum.reduceat(values, starts).round(6).tolist(),
+            "mean": (np.add.reduceat(values, starts) / counts).round(6).tolist(),
+        }
+    return result
+
+def update_telemetry_data(car_data, transform, velocity, timestamp):
     speed = 3.6 * (velocity.x**2 + velocity.y**2 + velocity.z**2)**0.5
+    # Replaced rather than mutated so readers holding the old dict see a consistent record
+    telemetry = {
+        "lat": transform.location.y, 
+        "lon": transform.location.x,
+        "speed": round(speed, 2),
+        "timestamp": timestamp
+    }
     with car_data['lock']:
-        car_data['telemetry'].update({
-            "lat": transform.location.y, 
-            "lon": transform.location.x,
-            "speed": round(speed, 2),
-            "timestamp": time.time()
-        })
+        car_data['telemetry'] = telemetry
+    return telemetry
 
-def carla_simulation_thread(car_id, spawn_point, tm_port, model='vehicle.tesla.model3'):
-    vehicle = None
-    first_person_camera = None
-    third_person_camera = None
-    
-    try:
-        client = carla.Client('localhost', 2000)
-        client.set_timeout(10.0)
-        world = client.get_world()
-        bp_library = world.get_blueprint_library() 
-        
-        vehicle_bp = bp_library.find(model)
-        if not vehicle_bp:
-            print(f"WARNING: [{car_id}] Model {model} not found, using Tesla Model 3 as fallback")
-            vehicle_bp = random.choice(bp_library.filter('vehicle.tesla.model3'))
-        
-        vehicle = world.try_spawn_actor(vehicle_bp, spawn_point)
-        if vehicle is None:
-            print(f"FATAL ERROR: [{car_id}] Failed to spawn vehicle. Exiting thread.")
-            return
+def schedule_audio(car_id, car_data, speed, now, uploader):
+    if speed < MIN_SPEED_FOR_AUDIO:
+        if car_data['stuck_start_time'] is None:
+            car_data['stuck_start_time'] = now
+        stuck_duration = now - car_data['stuck_start_time']
+    else:
+        car_data['stuck_start_time'] = None
+        stuck_duration = 0
 
-        vehicle.set_autopilot(True, tm_port) 
-        print(f"INFO: [{car_id}] Vehicle spawned and set to Autopilot on TM port {tm_port}.")
-
-        first_person_camera_bp = bp_library.find('sensor.camera.rgb')
-        first_person_camera_bp.set_attribute('image_size_x', '640')
-        first_person_camera_bp.set_attribute('image_size_y', '480')
-        first_person_transform = carla.Transform(carla.Location(x=1.5, z=2.4))
-        first_person_camera = world.spawn_actor(
-            first_person_camera_bp, 
-            first_person_transform, 
-            attach_to=vehicle
-        )
-        
-        third_person_camera_bp = bp_library.find('sensor.camera.rgb')
-        third_person_camera_bp.set_attribute('image_size_x', '640')
-        third_person_camera_bp.set_attribute('image_size_y', '480')
-        third_person_transform = carla.Transform(
-            carla.Location(x=-6.0, z=4.0),
-            carla.Rotation(pitch=-15.0)
-        )
-        third_person_camera = world.spawn_actor(
-            third_person_camera_bp, 
-            third_person_transform, 
-            attach_to=vehicle
-        )
-        
-        car_agents[car_id] = {
+    if speed >= MIN_SPEED_FOR_AUDIO or stuck_duration >= STUCK_COLLISION_SECONDS:
+        if now - car_data['last_audio_time'] >= AUDIO_INTERVAL:
+            uploader.submit(car_id, speed, car_data['previous_speed'], stuck_duration)
+            car_data['previous_speed'] = speed
+            car_data['last_audio_time'] = now
+    else:
+        car_data['previous_speed'] = 0.0
+
+class FleetEngine:
+    # One world.on_tick callback drives every car: positions and velocities come
+    # from the tick's WorldSnapshot, so there is no per-car thread or RPC. The
+    # world is passed in, which lets the engine run against a stand-in carla module.
+    def __init__(self, world, client=None, agents=None, uploader=None, board=None, exporter=None, store=None):
+        self.world = world
+        self.client = client
+        self.agents = car_agents if agents is None else agents
+        self.uploader = audio_uploader if uploader is None else uploader
+        self.board = telemetry_board if board is None else board
+        self.exporter = telemetry_exporter if exporter is None else exporter
+        self.store = frame_store if store is None else store
+        self.lock = threading.Lock()
+        # Car ids claimed by a spawn in progress, so concurrent or duplicate
+        # requests cannot spawn the same car twice
+        self.reserved = set()
+        self.callback_id = None
+        self.ticks = 0
+        self.last_tick_ms = 0.0
+
+    def start(self):
+        if self.callback_id is None:
+            self.callback_id = self.world.on_tick(self.on_tick)
+            print("INFO: Fleet engine listening for world ticks.")
+
+    def stop(self):
+        if self.callback_id is not None:
+            self.world.remove_on_tick(self.callback_id)
+            self.callback_id = None
+
+    def reserve(self, car_id):
+        with self.lock:
+            if car_id in self.agents or car_id in self.reserved:
+                return False
+            self.reserved.add(car_id)
+            return True
+
+    def release(self, car_id):
+        with self.lock:
+            self.reserved.discard(car_id)
+
+    def shared_camera(self, car_id, camera_type):
+        if self.store is None:
+            return None
+        width, height = (int(size) for size in CAMERA_IMAGE_SIZE)
+        try:
+            return self.store.open_camera(car_id, camera_type, width, height)
+        except OSError as e:
+            print(f"WARNING: [{car_id}] Could not publish {camera_type} frames to shared memory ({e}), "
+                  "video is served by the bridge only.")
+            return None
+
+    def register(self, car_id, vehicle, first_person_camera, third_person_camera, tm_port=None):
+        car_data = {
             'vehicle': vehicle,
             'first_person_camera': first_person_camera,
             'third_person_camera': third_person_camera,
+            'tm_port': tm_port,
             'telemetry': {'lat': 0.0, 'lon': 0.0, 'speed': 0.0, 'timestamp': time.time()},
-            'first_person_frame': None,
-            'third_person_frame': None,
+            'feeds': {
+                camera_type: CameraFeed(shared=self.shared_camera(car_id, camera_type))
+                for camera_type in ('first_person', 'third_person')
+            },
+            'history': TelemetryHistory(),
+            'previous_speed': 0.0,
+            'last_audio_time': time.time(),
+            'stuck_start_time': None,
             'lock': threading.Lock()
         }
-        car_data = car_agents[car_id]
-        
         first_person_camera.listen(
             lambda image: camera_callback(image, car_id, car_data, 'first_person')
         )
         third_person_camera.listen(
             lambda image: camera_callback(image, car_id, car_data, 'third_person')
         )
+        with self.lock:
+            self.agents[car_id] = car_data
+            self.reserved.discard(car_id)
+        return car_data
 
-        last_audio_time = time.time()
-        stuck_start_time = None
-        while True:
-            update_telemetry_data(car_id, car_data) 
-            
-            with car_data['lock']:
-                current_speed = car_data['telemetry'].get('speed', 0.0)
-                previous_speed = car_data.get('previous_speed', 0.0)
-            
-            if current_speed < MIN_SPEED_FOR_AUDIO:
-                if stuck_start_time is None:
-                    stuck_start_time = time.time()
-                stuck_duration = time.time() - stuck_start_time
-            else:
-                stuck_start_time = None
-                stuck_duration = 0
-
-            if current_speed >= MIN_SPEED_FOR_AUDIO or stuck_duration >= 30:
-                if time.time() - last_audio_time >= AUDIO_INTERVAL:
-                    upload_audio_to_express(car_id, current_speed, previous_speed, stuck_duration)
-                    with car_data['lock']:
-                        car_data['previous_speed'] = current_speed
-                last_audio_time = time.time()
-            else:
-                with car_data['lock']:
-                    car_data['previous_speed'] = 0.0
-            
-            time.sleep(0.01)
+    def unregister(self, car_id, cleanup=None):
+        with self.lock:
+            car_data = self.agents.pop(car_id, None)
+        if car_data is None:
+            return False
+        for camera_type, feed in car_data['feeds'].items():
+            feed.close()
+            if feed.shared is not None:
+                feed.shared = None
+                self.store.close_camera(car_id, camera_type)
+        if car_data['tm_port'] is not None:
+            tm_ports.release(car_data['tm_port'])
 
-    except KeyboardInterrupt:
-        print(f"\nINFO: [{car_id}] Simulation interrupted by user.")
-    except Exception as e:
-        print(f"FATAL ERROR in [{car_id}] CARLA thread: {e}")
-    finally:
-        print(f"INFO: [{car_id}] Cleaning up actors...")
-        
-        if car_id in car_agents:
-            del car_agents[car_id]
-        
-        if CLEANUP_ON_EXIT:
+        if CLEANUP_ON_EXIT if cleanup is None else cleanup:
+            for camera in (car_data['first_person_camera'], car_data['third_person_camera']):
+                if camera is not None and camera.is_alive:
+                    camera.stop()
+                    camera.destroy()
+            vehicle = car_data['vehicle']
             if vehicle is not None and vehicle.is_alive:
-                 vehicle.set_autopilot(False)
-            
-            if first_person_camera is not None and first_person_camera.is_alive: 
-                first_person_camera.destroy()
-            if third_person_camera is not None and third_person_camera.is_alive: 
-                third_person_camera.destroy()
-            if vehicle is not None and vehicle.is_alive: 
+                vehicle.set_autopilot(False)
                 vehicle.destroy()
             print(f"INFO: [{car_id}] Cleanup complete.")
         else:
             print(f"INFO: [{car_id}] Cleanup skipped. Actor remains in world for inspection.")
+        return True
+
+    def shutdown(self):
+        self.stop()
+        for car_id in list(self.agents):
+            self.unregister(car_id)
+
+    def on_tick(self, snapshot):
+        started = time.perf_counter()
+        now = time.time()
+        with self.lock:
+            cars = list(self.agents.items())
+        fleet_telemetry = {}
+        for car_id, car_data in cars:
+            actor = snapshot.find(car_data['vehicle'].id)
+            if actor is not None:
+                try:
+                    telemetry = update_telemetry_data(car_data, actor.get_transform(), actor.get_velocity(), now)
+                    if car_data['history'].append(now, telemetry['lat'], telemetry['lon'], telemetry['speed']):
+                        self.exporter.add(car_id, now, telemetry['lat'], telemetry['lon'], telemetry['speed'])
+                    schedule_audio(car_id, car_data, telemetry['speed'], now, self.uploader)
+                except Exception as e:
+                    print(f"ERROR: [{car_id}] Fleet tick failed: {e}")
+            fleet_telemetry[car_id] = car_data['telemetry']
+        self.board.publish(fleet_telemetry)
+        self.ticks += 1
+        self.last_tick_ms = (time.perf_counter() - started) * 1000.0
+
+    def stats(self):
+        return {
+            'ticks': self.ticks,
+            'last_tick_ms': round(self.last_tick_ms, 3),
+            'cars': len(self.agents),
+        }
+
+fleet = None
+frame_store = None
+
+def get_carla_world():
+    client = carla.Client('localhost', 2000)
+    client.set_timeout(10.0)
+    return client, client.get_world()
+
+CAMERA_IMAGE_SIZE = ('640', '480')
+MAX_BULK_SPAWN = 500
+
+def camera_transforms():
+    return {
+        'first_person': carla.Transform(carla.Location(x=1.5, z=2.4)),
+        'third_person': carla.Transform(
+            carla.Location(x=-6.0, z=4.0),
+            carla.Rotation(pitch=-15.0)
+        ),
+    }
+
+class TrafficManagerPorts:
+    # Reference-counted so cars can share a Traffic Manager, and a port is only
+    # handed out again once every car using it has been removed
+    def __init__(self, base=TM_PORT_BASE):
+        self.base = base
+        self.lock = threading.Lock()
+        self.users = {}
+
+    def acquire(self, port=None):
+        with self.lock:
+            if port is None:
+                port = self.base
+                while port in self.users:
+                    port += 1
+            self.users[port] = self.users.get(port, 0) + 1
+            return port
+
+    def release(self, port):
+        with self.lock:
+            if port not in self.users:
+                return
+            self.users[port] -= 1
+            if self.users[port] <= 0:
+                del self.users[port]
+
+tm_ports = TrafficManagerPorts()
+
+def find_blueprint(bp_library, model):
+    try:
+        return bp_library.find(model)
+    except IndexError:
+        return None
+
+def spawn_cars(client, world, cars, shared_traffic_manager=True):
+    # cars: [{'car_id', 'spawn_point', 'model'}]. Vehicles (with autopilot) and
+    # then their cameras are spawned in one apply_batch_sync round trip each.
+    # Car ids are reserved on the fleet before the first RPC and released once
+    # the cars are registered or have failed.
+    results = []
+    reserved = []
+    for car in cars:
+        result = {'car_id': car['car_id'], 'model': car.get('model', 'vehicle.tesla.model3'), 'status': 'failed'}
+        results.append(result)
+        if fleet.reserve(result['car_id']):
+            reserved.append((car, result))
+        else:
+            result['error'] = f"Car {result['car_id']} already exists or is being spawned"
+    try:
+        if reserved:
+            _spawn_reserved(client, world, reserved, shared_traffic_manager)
+    finally:
+        for car, result in reserved:
+            fleet.release(result['car_id'])
+
+    for result in results:
+        if result['status'] == 'failed':
+            print(f"ERROR: [{result['car_id']}] {result['error']}")
+    return results
+
+def _spawn_reserved(client, world, cars, shared_traffic_manager):
+    SpawnActor = carla.command.SpawnActor
+    SetAutopilot = carla.command.SetAutopilot
+    FutureActor = carla.command.FutureActor
+    DestroyActor = carla.command.DestroyActor
+
+    bp_library = run_blocking(world.get_blueprint_library)
+    camera_bp = bp_library.find('sensor.camera.rgb')
+    camera_bp.set_attribute('image_size_x', CAMERA_IMAGE_SIZE[0])
+    camera_bp.set_attribute('image_size_y', CAMERA_IMAGE_SIZE[1])
+    transforms = camera_transforms()
+
+    pending = []
+    shared_port = None
+    blueprints = {}
+    for car, result in cars:
+        model = result['model']
+        if model not in blueprints:
+            blueprints[model] = find_blueprint(bp_library, model)
+        if not blueprints[model]:
+            result['error'] = f"Model {model} not found"
+            continue
+        if shared_traffic_manager:
+            shared_port = tm_ports.acquire(shared_port)
+            result['tm_port'] = shared_port
+        else:
+            result['tm_port'] = tm_ports.acquire()
+        pending.append((car, result))
+
+    for port in sorted({result['tm_port'] for _, result in pending}):
+        run_blocking(client.get_trafficmanager, port)
+
+    responses = run_blocking(client.apply_batch_sync, [
+        SpawnActor(blueprints[result['model']], car['spawn_point'])
+            .then(SetAutopilot(FutureActor, True, result['tm_port']))
+        for car, result in pending
+    ], False)
+    spawned = []
+    for (car, result), response in zip(pending, responses):
+        if response.error:
+            result['error'] = f"Vehicle spawn failed: {response.error}"
+            tm_ports.release(result['tm_port'])
+        else:
+            result['vehicle_id'] = response.actor_id
+            spawned.append(result)
+
+    responses = run_blocking(client.apply_batch_sync, [
+        SpawnActor(camera_bp, transforms[camera_type], result['vehicle_id'])
+        for result in spawned
+        for camera_type in ('first_person', 'third_person')
+    ], False)
+    registered = []
+    cleanup = []
+    for i, result in enumerate(spawned):
+        camera_responses = responses[2 * i:2 * i + 2]
+        errors = [r.error for r in camera_responses if r.error]
+        if errors:
+            result['error'] = f"Camera spawn failed: {errors[0]}"
+            cleanup.append(result['vehicle_id'])
+            cleanup.extend(r.actor_id for r in camera_responses if not r.error)
+            tm_ports.release(result['tm_port'])
+        else:
+            result['camera_ids'] = [r.actor_id for r in camera_responses]
+            registered.append(result)
+    if cleanup:
+        run_blocking(client.apply_batch, [DestroyActor(actor_id) for actor_id in cleanup])
+
+    actor_ids = [actor_id for result in registered for actor_id in [result['vehicle_id']] + result['camera_ids']]
+    actors = {actor.id: actor for actor in run_blocking(world.get_actors, actor_ids)} if actor_ids else {}
+    for result in registered:
+        first_person_id, third_person_id = result.pop('camera_ids')
+        fleet.register(result['car_id'], actors[result['vehicle_id']], actors[first_person_id],
+                       actors[third_person_id], result['tm_port'])
+        result['status'] = 'spawned'
+        print(f"INFO: [{result['car_id']}] Vehicle spawned and set to Autopilot on TM port {result['tm_port']}.")
+
+def next_car_ids(count, prefix=CAR_ID_PREFIX, start=1000):
+    ids = []
+    n = start
+    while len(ids) < count:
+        car_id = f"{prefix}{n}"
+        if car_id not in car_agents and (fleet is None or car_id not in fleet.reserved):
+            ids.append(car_id)
+        n += 1
+    return ids
+
+@app.route('/telemetry', methods=['GET'])
+def get_fleet_telemetry():
+    _, body = telemetry_board.snapshot_json()
+    return Response(body, mimetype='application/json')
+
+@app.route('/telemetry-stream', methods=['GET'])
+def telemetry_stream():
+    rate = request.args.get('rate', TELEMETRY_STREAM_RATE, type=float)
+    if not 0 < rate <= MAX_TELEMETRY_STREAM_RATE:
+        abort(400, description=f"rate must be between 0 and {MAX_TELEMETRY_STREAM_RATE:g} updates per second.")
+    min_interval = 1.0 / rate
+
+    def generate_events():
+        # A full snapshot first, then at most `rate` update events per second with
+        # only the cars that moved since the previous event
+        waiter = update_waiter(telemetry_board)
+        try:
+            seq, body = telemetry_board.snapshot_json()
+            yield f"event: snapshot\nid: {seq}\ndata: {body}\n\n"
+            last_seq = seq
+            next_send = time.time() + min_interval
+            while not telemetry_board.closed:
+                delay = next_send - time.time()
+                if delay > 0:
+                    waiter.sleep(delay)
+                if waiter.wait(last_seq, TELEMETRY_KEEPALIVE) is None:
+                    yield ": keepalive\n\n"
+                    continue
+                changes = telemetry_board.changes_since(last_seq)
+                if changes is None:
+                    seq, body = telemetry_board.snapshot_json()
+                    yield f"event: snapshot\nid: {seq}\ndata: {body}\n\n"
+                else:
+                    seq, changed, removed = changes
+                    if changed or removed:
+                        data = json.dumps({"seq": seq, "cars": changed, "removed": removed})
+                        yield f"event: update\nid: {seq}\ndata: {data}\n\n"
+                last_seq = seq
+                next_send = time.time() + min_interval
+        finally:
+            waiter.close()
+
+    return Response(
+        generate_events(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @app.route('/telemetry/<string:car_id>', methods=['GET'])
 def get_telemetry(car_id):
@@ -386,46 +1300,146 @@ def get_telemetry(car_id):
             "telemetry": car_data['telemetry']
         })
 
-@app.route('/video-stream/<string:car_id>', methods=['GET'])
-def video_feed_first_person(car_id):
+@app.route('/telemetry/<string:car_id>/history', methods=['GET'])
+def get_telemetry_history(car_id):
     if car_id not in car_agents:
         abort(404, description=f"Car ID {car_id} not found.")
-    car_data = car_agents[car_id]
-    
-    def generate_video_stream():
+    start = request.args.get('from', type=float)
+    end = request.args.get('to', type=float)
+    step = request.args.get('step', type=float)
+    if start is not None and end is not None and end < start:
+        abort(400, description="'to' must not be earlier than 'from'.")
+    if step is not None and step <= 0:
+        abort(400, description="step must be positive.")
+
+    samples = car_agents[car_id]['history'].range(start, end)
+    if step is None:
+        history = {"timestamp": samples['timestamp'].round(3).tolist()}
+        history.update({field: samples[field].astype(np.float64).round(6).tolist() for field in HISTORY_FIELDS})
+    else:
+        history = downsample_history(samples, step, start)
+    return jsonify({
+        "car_id": car_id,
+        "from": start,
+        "to": end,
+        "step": step,
+        "samples": len(samples),
+        "history": history
+    })
+
+STREAM_WAIT_TIMEOUT = 5.0
+STREAM_ENCODE_THREADS = 4
+SHUTDOWN_TIMEOUT = 5.0
+stream_backend = 'thread'
+
+class UpdateWaiter:
+    # Used by streaming generators under the threaded development server
+    def __init__(self, source):
+        self.source = source
+
+    def wait(self, after_seq, timeout):
+        return self.source.wait_for_update(after_seq, timeout)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def call(self, fn, *args):
+        return fn(*args)
+
+    def close(self):
+        pass
+
+class GeventUpdateWaiter(UpdateWaiter):
+    # Under gevent the stream generator is a greenlet and must not block on a
+    # threading.Condition. Producer threads wake it through a hub async watcher
+    # (safe to send from any thread), and blocking work such as JPEG encoding
+    # runs on the hub's threadpool so other greenlets keep being served.
+    def __init__(self, source):
+        import gevent
+        import gevent.event
+        super().__init__(source)
+        self.gevent = gevent
+        self.hub = gevent.get_hub()
+        self.event = gevent.event.Event()
+        self.watcher = self.hub.loop.async_()
+        self.watcher.start(self.event.set)
+        source.listeners.add(self.watcher.send)
+
+    def wait(self, after_seq, timeout):
+        deadline = time.time() + timeout
         while True:
-            with car_data['lock']:
-                frame = car_data['first_person_frame']
-            if frame is not None:
-                yield (b'--frame\r\n' 
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(0.05)
-    
-    return Response(
-        generate_video_stream(), 
-        mimetype='multipart/x-mixed-replace; boundary=frame'
-    )
+            self.event.clear()
+            if self.source.closed:
+                return None
+            seq = self.source.seq
+            if seq > after_seq:
+                return seq
+            remaining = deadline - time.time()
+            if remaining <= 0 or not self.event.wait(remaining):
+                return None
 
-@app.route('/video-stream-third-person/<string:car_id>', methods=['GET'])
-def video_feed_third_person(car_id):
+    def sleep(self, seconds):
+        self.gevent.sleep(seconds)
+
+    def call(self, fn, *args):
+        return self.hub.threadpool.apply(fn, args)
+
+    def close(self):
+        self.source.listeners.discard(self.watcher.send)
+        self.watcher.close()
+
+def update_waiter(source):
+    return GeventUpdateWaiter(source) if stream_backend == 'gevent' else UpdateWaiter(source)
+
+def run_blocking(fn, *args):
+    # CARLA RPCs made from request handlers; under gevent they run on the
+    # hub's threadpool so streams keep being served while the server replies
+    if stream_backend == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+def stream_camera(car_id, camera_type):
     if car_id not in car_agents:
         abort(404, description=f"Car ID {car_id} not found.")
-    car_data = car_agents[car_id]
+    feed = car_agents[car_id]['feeds'][camera_type]
+    min_interval, scale, quality = stream_params()
     
     def generate_video_stream():
-        while True:
-            with car_data['lock']:
-                frame = car_data['third_person_frame']
-            if frame is not None:
-                yield (b'--frame\r\n' 
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            time.sleep(0.05)
+        # Each client blocks until a frame newer than the one it last sent exists;
+        # frames that arrive while it is busy or rate limited are skipped
+        waiter = update_waiter(feed)
+        last_seq = 0
+        next_send = 0.0
+        try:
+            while not feed.closed:
+                delay = next_send - time.time()
+                if delay > 0:
+                    waiter.sleep(delay)
+                if waiter.wait(last_seq, STREAM_WAIT_TIMEOUT) is None:
+                    continue
+                seq, frame = waiter.call(feed.latest_jpeg, scale, quality)
+                if frame is None or seq <= last_seq:
+                    continue
+                last_seq = seq
+                next_send = time.time() + min_interval
+                yield mjpeg_part(frame)
+        finally:
+            waiter.close()
     
     return Response(
         generate_video_stream(), 
-        mimetype='multipart/x-mixed-replace; boundary=frame'
+        mimetype=MJPEG_MIMETYPE
     )
 
+@app.route('/video-stream/<string:car_id>', methods=['GET'])
+def video_feed_first_person(car_id):
+    return stream_camera(car_id, 'first_person')
+
+@app.route('/video-stream-third-person/<string:car_id>', methods=['GET'])
+def video_feed_third_person(car_id):
+    return stream_camera(car_id, 'third_person')
+
 @app.route('/car-list', methods=['GET'])
 def get_car_list():
     return jsonify(list(car_agents.keys()))
@@ -435,9 +1449,21 @@ def health_check():
     return jsonify({
         "status": "healthy", 
         "cars_connected": len(car_agents),
-        "active_cars": list(car_agents.keys())
+        "active_cars": list(car_agents.keys()),
+        "audio_uploads": audio_uploader.stats(),
+        "telemetry_export": telemetry_exporter.stats(),
+        "fleet": fleet.stats() if fleet else None,
+        "frame_store": frame_store.name if frame_store else None
     })
 
+def spawn_point_from_location(location):
+    if location.get('lat') is not None and location.get('lon') is not None:
+        return carla.Transform(
+            carla.Location(x=float(location['lon']), y=float(location['lat']), z=0.5),
+            carla.Rotation()
+        )
+    return None
+
 @app.route('/add-car', methods=['POST'])
 def add_car_manual():
     try:
@@ -449,64 +1475,99 @@ def add_car_manual():
         if not car_id:
             return jsonify({"error": "Car ID is required"}), 400
 
-        client = carla.Client('localhost', 2000)
-        client.set_timeout(10.0)
-        world = client.get_world()
-        bp_library = world.get_blueprint_library()
-        
-        vehicle_bp = bp_library.find(model)
-        if not vehicle_bp:
+        if fleet is None:
+            return jsonify({"error": "Simulation is not running"}), 503
+        if car_id in car_agents:
+            return jsonify({"error": f"Car {car_id} already exists"}), 409
+
+        world = fleet.world
+        if not find_blueprint(run_blocking(world.get_blueprint_library), model):
             return jsonify({"error": f"Model {model} not found"}), 400
         
-        if location.get('lat') is not None and location.get('lon') is not None:
-            spawn_point = carla.Transform(
-                carla.Location(x=float(location['lon']), y=float(location['lat']), z=0.5),
-                carla.Rotation()
-            )
-        else:
-            spawn_points = world.get_map().get_spawn_points()
+        spawn_point = spawn_point_from_location(location)
+        if spawn_point is None:
+            spawn_points = run_blocking(lambda: world.get_map().get_spawn_points())
             if not spawn_points:
                 return jsonify({"error": "No spawn points available"}), 400
             spawn_point = random.choice(spawn_points)
         
-        tm_port = TM_PORT_BASE + len(car_agents)
-        
-        carla_thread = threading.Thread(
-            target=carla_simulation_thread, 
-            args=(car_id, spawn_point, tm_port, model),
-            name=f"CarlaThread-{car_id}"
-        )
-        carla_thread.start()
-        
-        time.sleep(1.0)
+        result = spawn_cars(fleet.client, world, [
+            {'car_id': car_id, 'spawn_point': spawn_point, 'model': model}
+        ], shared_traffic_manager=False)[0]
+        if result['status'] != 'spawned':
+            return jsonify({"error": f"Failed to spawn car {car_id}: {result['error']}"}), 500
         
         return jsonify({
             "message": f"Car {car_id} added successfully",
             "car_id": car_id,
             "model": model,
-            "tm_port": tm_port
+            "tm_port": result['tm_port']
         })
         
     except Exception as e:
         return jsonify({"error": f"Failed to add car: {str(e)}"}), 500
 
+@app.route('/add-cars', methods=['POST'])
+def add_cars_bulk():
+    try:
+        data = request.get_json() or {}
+        if fleet is None:
+            return jsonify({"error": "Simulation is not running"}), 503
+
+        cars = data.get('cars')
+        if cars is None:
+            count = int(data.get('count', 0))
+            if count <= 0:
+                return jsonify({"error": "Either 'cars' or a positive 'count' is required"}), 400
+        else:
+            count = len(cars)
+            if any(not car.get('car_id') for car in cars):
+                return jsonify({"error": "Every car needs a car_id"}), 400
+        if count > MAX_BULK_SPAWN:
+            return jsonify({"error": f"At most {MAX_BULK_SPAWN} cars can be added per request"}), 400
+
+        world = fleet.world
+        spawn_points = run_blocking(lambda: world.get_map().get_spawn_points())
+        random.shuffle(spawn_points)
+        if cars is None:
+            # Picked after the last yield so spawn_cars reserves them before another request can
+            model = data.get('model', 'vehicle.tesla.model3')
+            cars = [{'car_id': car_id, 'model': model}
+                    for car_id in next_car_ids(count, data.get('car_id_prefix', CAR_ID_PREFIX))]
+        specs = []
+        for car in cars:
+            spawn_point = spawn_point_from_location(car.get('location', {}))
+            if spawn_point is None:
+                if not spawn_points:
+                    return jsonify({"error": "Not enough spawn points available"}), 400
+                spawn_point = spawn_points.pop()
+            specs.append({
+                'car_id': car['car_id'],
+                'spawn_point': spawn_point,
+                'model': car.get('model', data.get('model', 'vehicle.tesla.model3'))
+            })
+
+        started = time.time()
+        results = spawn_cars(fleet.client, world, specs,
+                             shared_traffic_manager=data.get('shared_traffic_manager', True))
+        spawned = sum(1 for result in results if result['status'] == 'spawned')
+        return jsonify({
+            "requested": len(results),
+            "spawned": spawned,
+            "failed": len(results) - spawned,
+            "duration_s": round(time.time() - started, 3),
+            "results": results
+        }), (200 if spawned else 500)
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to add cars: {str(e)}"}), 500
+
 @app.route('/remove-car/<string:car_id>', methods=['POST'])
 def remove_car(car_id):
-    if car_id not in car_agents:
+    # Stopping the sensors and destroying the actors are blocking RPCs;
+    # unregister returns False if a concurrent request removed the car first
+    if not run_blocking(fleet.unregister, car_id):
         return jsonify({"error": f"Car {car_id} not found"}), 404
-        
-    car_data = car_agents[car_id]
-    
-    if CLEANUP_ON_EXIT:
-        if car_data['first_person_camera'] and car_data['first_person_camera'].is_alive:
-            car_data['first_person_camera'].destroy()
-        if car_data['third_person_camera'] and car_data['third_person_camera'].is_alive:
-            car_data['third_person_camera'].destroy()
-        if car_data['vehicle'] and car_data['vehicle'].is_alive:
-            car_data['vehicle'].set_autopilot(False)
-            car_data['vehicle'].destroy()
-    
-    del car_agents[car_id]
     
     return jsonify({"message": f"Car {car_id} removed successfully"})
 
@@ -520,6 +1581,43 @@ def get_camera_positions():
         }
     return jsonify(camera_info)
 
+def close_all_streams():
+    telemetry_board.close()
+    for car_data in list(car_agents.values()):
+        for feed in car_data['feeds'].values():
+            feed.close()
+
+def serve_gevent(host, port):
+    # No monkey patching: CARLA sensor and tick callbacks run on native threads
+    # and keep using the threading primitives above
+    global stream_backend
+    import gevent
+    import signal
+    from gevent.pywsgi import WSGIServer
+
+    stream_backend = 'gevent'
+    gevent.get_hub().threadpool.maxsize = STREAM_ENCODE_THREADS
+    server = WSGIServer((host, port), app, log=None)
+
+    def shutdown():
+        print("INFO: Shutdown requested, closing streams and stopping server...")
+        close_all_streams()
+        server.stop(timeout=SHUTDOWN_TIMEOUT)
+
+    gevent.signal_handler(signal.SIGINT, shutdown)
+    gevent.signal_handler(signal.SIGTERM, shutdown)
+    server.serve_forever()
+    gevent.get_hub().threadpool.kill()
+
+def serve(host, port, server='gevent', debug=False):
+    if server == 'gevent':
+        try:
+            return serve_gevent(host, port)
+        except ImportError:
+            print("WARNING: gevent is not installed, falling back to the development server.")
+    # The reloader would re-execute this module and spawn a second fleet
+    app.run(host=host, port=port, debug=debug, use_reloader=False, threaded=True)
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='CARLA Python Bridge Server.')
     parser.add_argument(
@@ -527,6 +1625,33 @@ if __name__ == '__main__':
         action='store_true',
         help='If set, actors will NOT be destroyed on thread exit or crash.'
     )
+    parser.add_argument(
+        '--cars',
+        type=int,
+        default=NUMBER_OF_CARS,
+        help='Number of cars to spawn at startup.'
+    )
+    parser.add_argument(
+        '--no-telemetry-export',
+        action='store_true',
+        help='Do not forward batched telemetry to the Express backend.'
+    )
+    parser.add_argument(
+        '--server',
+        choices=['gevent', 'dev'],
+        default='gevent',
+        help='HTTP server: gevent (default) or the Flask development server.'
+    )
+    parser.add_argument(
+        '--debug',
+        action='store_true',
+        help='Enable Flask debug mode (development server only).'
+    )
+    parser.add_argument(
+        '--frame-store',
+        action='store_true',
+        help='Publish camera frames to shared memory for frame_server.py video workers.'
+    )
     args = parser.parse_args()
 
     CLEANUP_ON_EXIT = not args.no_cleanup
@@ -534,49 +1659,57 @@ if __name__ == '__main__':
     if not CLEANUP_ON_EXIT:
         print("\n\n⚠️ WARNING: ACTOR CLEANUP DISABLED. Actors will remain in CARLA world after thread exit.")
 
-    threads = []
-    
     try:
-        client = carla.Client('localhost', 2000)
-        client.set_timeout(10.0)
-        world = client.get_world()
+        get_audio_catalog()
+        audio_uploader.start()
+        if not args.no_telemetry_export:
+            telemetry_exporter.start()
+
+        if args.frame_store:
+            try:
+                frame_store = FrameStore()
+                print(f"INFO: Publishing camera frames to shared memory '{frame_store.name}'.")
+            except ImportError:
+                print("WARNING: --frame-store needs Python 3.8+ (multiprocessing.shared_memory), "
+                      "video is served by the bridge only.")
+            except OSError as e:
+                # e.g. /dev/shm missing, full or read-only in a container
+                print(f"WARNING: Could not create the shared memory frame store ({e}), "
+                      "video is served by the bridge only.")
+
+        client, world = get_carla_world()
+        fleet = FleetEngine(world, client)
+        fleet.start()
         
         spawn_points = world.get_map().get_spawn_points()
         random.shuffle(spawn_points) 
         
-        if len(spawn_points) < NUMBER_OF_CARS:
+        if len(spawn_points) < args.cars:
             print(f"WARNING: Only {len(spawn_points)} spawn points available, reducing cars to match.")
-            num_to_spawn = len(spawn_points)
-        else:
-            num_to_spawn = NUMBER_OF_CARS
-
-        for i in range(num_to_spawn):
-            car_id = f"{CAR_ID_PREFIX}{1000 + i}"
-            spawn_point = spawn_points[i]
-            tm_port = TM_PORT_BASE + i
-
-            print(f"INFO: Initializing car thread for {car_id} on TM Port {tm_port}...")
-            
-            carla_thread = threading.Thread(
-                target=carla_simulation_thread, 
-                args=(car_id, spawn_point, tm_port),
-                name=f"CarlaThread-{car_id}"
-            )
-            carla_thread.start()
-            threads.append(carla_thread)
-            time.sleep(1.0) 
+        num_to_spawn = min(args.cars, len(spawn_points))
+
+        print(f"INFO: Spawning {num_to_spawn} cars...")
+        results = spawn_cars(client, world, [
+            {'car_id': car_id, 'spawn_point': spawn_point}
+            for car_id, spawn_point in zip(next_car_ids(num_to_spawn), spawn_points)
+        ])
+        print(f"INFO: {sum(1 for r in results if r['status'] == 'spawned')}/{num_to_spawn} cars spawned.")
 
         print(f"INFO: Starting Python Bridge API on http://localhost:{CARLA_BRIDGE_PORT}")
         print(f"INFO: Available endpoints:")
         print(f"  - First person view: /video-stream/<car_id>")
         print(f"  - Third person view: /video-stream-third-person/<car_id>")
         print(f"  - Camera positions: /camera-positions")
-        app.run(host='0.0.0.0', port=CARLA_BRIDGE_PORT, debug=True, use_reloader=True)
+        serve('0.0.0.0', CARLA_BRIDGE_PORT, server=args.server, debug=args.debug)
 
     except Exception as e:
         print(f"FATAL ERROR during startup: {e}")
     finally:
-        print("INFO: Waiting for all car threads to shut down...")
-        for t in threads:
-            t.join() 
-        print("INFO: Python Bridge shut down.")
\ No newline at end of file
+        print("INFO: Shutting down fleet...")
+        if fleet is not None:
+            fleet.shutdown()
+        if frame_store is not None:
+            frame_store.close()
+        audio_uploader.stop()
+        telemetry_exporter.stop()
+        print("INFO: Python Bridge shut down.")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import signal
+import socket
+import time
+from flask import Flask, jsonify, Response, abort
+from flask_cors import CORS
+from frame_store import FrameStoreReader, FRAME_STORE_NAME
+from video_stream import MJPEG_MIMETYPE, VariantCache, encode_jpeg, mjpeg_part, stream_params
+
+# Serves the bridge's video routes from the shared-memory frame store written by
+# `carla_bridge.py --frame-store`, so encoding scales across processes instead
+# of sharing the CARLA process's GIL. Workers are forked onto one listening
+# socket; each attaches to the store and reads frames in place, and encodes
+# each (scale, quality) variant at most once per frame for all of its viewers.
+
+FRAME_SERVER_PORT = 5002
+POLL_INTERVAL = 0.005
+STREAM_WAIT_TIMEOUT = 5
+SHUTDOWN_TIMEOUT = 5
+
+app = Flask(__name__)
+CORS(app)
+
+store_name = FRAME_STORE_NAME
+reader = None
+variants = VariantCache()
+open_streams = 0
+
+def get_reader():
+    global reader
+    if reader is None:
+        reader = FrameStoreReader(store_name)
+    return reader
+
+def latest_jpeg(key, camera, scale, quality):
+    # Workers are single threaded (gevent without monkey patching), and nothing
+    # here yields, so no view into shared memory outlives this call
+    variant = variants.get(key)
+    seq, raw = camera.latest()
+    if raw is None or variant['seq'] == seq:
+        return variant['seq'], variant['jpeg']
+    jpeg = encode_jpeg(raw, scale, quality)
+    # The bridge may have reused the slot while it was being encoded
+    if jpeg is not None and camera.still_valid(seq):
+        variant['jpeg'] = jpeg
+        variant['seq'] = seq
+    return variant['seq'], variant['jpeg']
+
+def wait_for_frame(camera, after_seq, timeout, sleep):
+    deadline = time.time() + timeout
+    while not camera.closed:
+        if camera.seq > after_seq:
+            return True
+        if time.time() >= deadline:
+            return False
+        sleep(POLL_INTERVAL)
+    return False
+
+def stream_camera(car_id, camera_type):
+    camera = get_reader().camera(car_id, camera_type)
+    if camera is None:
+        abort(404, description=f"Car ID {car_id} not found.")
+    min_interval, scale, quality = stream_params()
+    key = (car_id, camera_type, scale, quality)
+
+    def generate_video_stream():
+        global open_streams
+        import gevent
+        open_streams += 1
+        last_seq = 0
+        next_send = 0.0
+        try:
+            while not camera.closed:
+                delay = next_send - time.time()
+                if delay > 0:
+                    gevent.sleep(delay)
+                if not wait_for_frame(camera, last_seq, STREAM_WAIT_TIMEOUT, gevent.sleep):
+                    # Closes the camera if its bridge went away without marking it closed
+                    get_reader().refresh()
+                    continue
+                seq, frame = latest_jpeg(key, camera, scale, quality)
+                if frame is None or seq <= last_seq:
+                    continue
+                last_seq = seq
+                next_send = time.time() + min_interval
+                yield mjpeg_part(frame)
+        finally:
+            open_streams -= 1
+
+    return Response(
+        generate_video_stream(),
+        mimetype=MJPEG_MIMETYPE
+    )
+
+@app.route('/video-stream/<string:car_id>', methods=['GET'])
+def video_feed_first_person(car_id):
+    return stream_camera(car_id, 'first_person')
+
+@app.route('/video-stream-third-person/<string:car_id>', methods=['GET'])
+def video_feed_third_person(car_id):
+    return stream_camera(car_id, 'third_person')
+
+@app.route('/camera-positions', methods=['GET'])
+def get_camera_positions():
+    camera_info = {}
+    for key in get_reader().camera_keys():
+        car_id, camera_type = key.split('/', 1)
+        path = "/video-stream/" if camera_type == 'first_person' else "/video-stream-third-person/"
+        camera_info.setdefault(car_id, {})[camera_type] = path + car_id
+    return jsonify(camera_info)
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    keys = get_reader().camera_keys()
+    return jsonify({
+        "status": "healthy" if keys else "waiting_for_bridge",
+        "frame_store": store_name,
+        "worker_pid": os.getpid(),
+        "cameras": len(keys),
+        "open_streams": open_streams,
+        "encoded_variants": len(variants)
+    })
+
+def run_worker(listener):
+    # Runs in a forked child: the gevent hub is created here, never in the parent
+    import gevent
+    from gevent import socket as gevent_socket
+    from gevent.pywsgi import WSGIServer
+
+    # The inherited listener is a blocking stdlib socket; accept must go through the hub
+    listener = gevent_socket.socket(listener.family, listener.type, fileno=listener.detach())
+    server = WSGIServer(listener, app, log=None)
+
+    def shutdown():
+        server.stop(timeout=SHUTDOWN_TIMEOUT)
+
+    gevent.signal_handler(signal.SIGINT, shutdown)
+    gevent.signal_handler(signal.SIGTERM, shutdown)
+    server.serve_forever()
+    if reader is not None:
+        reader.close()
+
+def start_worker(listener):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(listener)
+        except Exception as e:
+            print(f"ERROR: Frame server worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def serve(host, port, workers):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(1024)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    children = set()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        children.add(start_worker(listener))
+    print(f"INFO: {workers} frame server workers on http://{host}:{port} reading '{store_name}'")
+
+    # Workers that die are replaced until shutdown is requested
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"WARNING: Frame server worker {pid} exited with status {status}, restarting.")
+            children.add(start_worker(listener))
+    listener.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Multi-process video server for the CARLA bridge frame store.')
+    parser.add_argument(
+        '--host',
+        default='0.0.0.0',
+        help='Interface to listen on.'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=FRAME_SERVER_PORT,
+        help='Port to listen on.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of worker processes.'
+    )
+    parser.add_argument(
+        '--store-name',
+        default=FRAME_STORE_NAME,
+        help='Shared memory name the bridge publishes to (FRAME_STORE_NAME).'
+    )
+    args = parser.parse_args()
+
+    store_name = args.store_name
+    serve(args.host, args.port, max(1, args.workers))
+    print("INFO: Frame server shut down.")
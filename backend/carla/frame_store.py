@@ -0,0 +1,330 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# Shared-memory frame store: the CARLA bridge writes every camera frame into a
+# triple-buffered slot, and frame_server.py worker processes read the slots in
+# place. Requires Python 3.8+ (multiprocessing.shared_memory); on older versions
+# creating or attaching a segment raises ImportError.
+#
+# Camera segment: HEADER_WORDS uint64 header followed by NUM_SLOTS frames.
+#   header[SEQ] is the newest complete frame; it lives in slot seq % NUM_SLOTS,
+#   and header[SLOT_SEQ + slot] says which frame a slot holds (0 while being
+#   written). A reader checks that value again after using the frame.
+# Index segment: uint64 [MAGIC, generation, length, closed] followed by JSON
+#   mapping "car_id/camera_type" to camera segment names. The generation is odd
+#   while the writer is updating it. The closed flag is set before the index is
+#   unlinked, by the bridge on shutdown or by the next bridge after a crash, so
+#   attached readers know to attach to the new one. When the resource tracker
+#   unlinks a crashed bridge's segments instead, readers notice the unlink.
+
+FRAME_STORE_NAME = os.getenv("FRAME_STORE_NAME", "carla_frames")
+MAGIC = 0x43415246  # "CARF"
+VERSION = 1
+NUM_SLOTS = 3
+HEADER_WORDS = 16
+HEADER_BYTES = HEADER_WORDS * 8
+WIDTH, HEIGHT, CHANNELS, SLOTS, SEQ, CLOSED = 2, 3, 4, 5, 6, 7
+SLOT_SEQ = 8
+INDEX_BYTES = 256 * 1024
+INDEX_HEADER_WORDS = 4
+INDEX_CLOSED = 3
+
+
+def _shared_memory():
+    from multiprocessing import shared_memory
+    return shared_memory
+
+
+def attach_segment(name):
+    # Readers must not let the resource tracker unlink segments they do not own
+    shared_memory = _shared_memory()
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching always registers the segment, and
+        # forked workers share one tracker, so registration is skipped here
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def segment_unlinked(segment):
+    # An unlinked segment stays mapped for whoever has it open. The link count
+    # is only checked where the platform keeps a descriptor (POSIX)
+    fd = getattr(segment, '_fd', -1)
+    if fd < 0:
+        return False
+    try:
+        return os.fstat(fd).st_nlink == 0
+    except OSError:
+        return False
+
+
+def read_index(segment, header):
+    # (generation, camera segment names), or None while the writer is updating it
+    generation = int(header[1])
+    if generation % 2:
+        return None
+    length = int(header[2])
+    body = bytes(segment.buf[INDEX_HEADER_WORDS * 8:INDEX_HEADER_WORDS * 8 + length])
+    if int(header[1]) != generation:
+        return None
+    return generation, json.loads(body)["cameras"] if length else {}
+
+
+def retire_store(name):
+    # Marks the index and cameras left behind by a bridge that did not shut
+    # down cleanly as closed, so readers still attached to them let go, and
+    # unlinks them
+    shared_memory = _shared_memory()
+    try:
+        index = shared_memory.SharedMemory(name=f"{name}_index")
+    except FileNotFoundError:
+        return
+    header = np.ndarray((INDEX_HEADER_WORDS,), dtype=np.uint64, buffer=index.buf)
+    cameras = {}
+    if int(header[0]) == MAGIC:
+        for _ in range(100):
+            try:
+                current = read_index(index, header)
+            except ValueError:
+                break
+            if current is not None:
+                cameras = current[1]
+                break
+        header[INDEX_CLOSED] = 1
+    del header
+    index.close()
+    index.unlink()
+    for segment_name in cameras.values():
+        try:
+            SharedCamera(shared_memory.SharedMemory(name=segment_name), owner=True).close()
+        except (FileNotFoundError, ValueError):
+            pass
+
+
+def create_segment(name, size):
+    shared_memory = _shared_memory()
+    try:
+        # Left behind by a bridge that did not shut down cleanly
+        stale = shared_memory.SharedMemory(name=name)
+        stale.close()
+        stale.unlink()
+    except FileNotFoundError:
+        pass
+    return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+
+class SharedCamera:
+    def __init__(self, segment, owner=False):
+        self.segment = segment
+        self.owner = owner
+        # Sensor callbacks write while the bridge may be closing the camera
+        self.write_lock = threading.Lock()
+        self.header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=segment.buf)
+        if int(self.header[0]) != MAGIC:
+            raise ValueError(f"{segment.name} is not a frame store camera segment")
+        self.shape = (int(self.header[HEIGHT]), int(self.header[WIDTH]), int(self.header[CHANNELS]))
+        self.slots = int(self.header[SLOTS])
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8,
+                                 buffer=segment.buf, offset=HEADER_BYTES)
+
+    @classmethod
+    def create(cls, name, width, height, channels=4, slots=NUM_SLOTS):
+        segment = create_segment(name, HEADER_BYTES + slots * width * height * channels)
+        header = np.ndarray((HEADER_WORDS,), dtype=np.uint64, buffer=segment.buf)
+        header[:] = 0
+        header[1:SEQ] = (VERSION, width, height, channels, slots)
+        header[0] = MAGIC
+        return cls(segment, owner=True)
+
+    @property
+    def seq(self):
+        return int(self.header[SEQ])
+
+    @property
+    def closed(self):
+        header = self.header
+        return header is None or bool(header[CLOSED])
+
+    def write(self, frame):
+        with self.write_lock:
+            if self.frames is None:
+                return 0
+            seq = self.seq + 1
+            slot = seq % self.slots
+            self.header[SLOT_SEQ + slot] = 0
+            np.copyto(self.frames[slot], frame.reshape(self.shape))
+            self.header[SLOT_SEQ + slot] = seq
+            self.header[SEQ] = seq
+            return seq
+
+    def latest(self):
+        # (seq, view into shared memory) or (0, None) before the first frame.
+        # The view is only trustworthy while still_valid(seq) holds.
+        seq = self.seq
+        if seq == 0:
+            return 0, None
+        slot = seq % self.slots
+        if int(self.header[SLOT_SEQ + slot]) != seq:
+            return 0, None
+        return seq, self.frames[slot]
+
+    def still_valid(self, seq):
+        return int(self.header[SLOT_SEQ + seq % self.slots]) == seq
+
+    def close(self):
+        with self.write_lock:
+            if self.frames is None:
+                return
+            if self.owner:
+                self.header[CLOSED] = 1
+            # Views must go before the mapping can be closed
+            self.header = None
+            self.frames = None
+        self.segment.close()
+        if self.owner:
+            try:
+                self.segment.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class FrameStore:
+    # Writer side, owned by the CARLA bridge process
+    def __init__(self, name=FRAME_STORE_NAME):
+        self.name = name
+        retire_store(name)
+        self.index_segment = create_segment(f"{name}_index", INDEX_BYTES)
+        self.index_header = np.ndarray((INDEX_HEADER_WORDS,), dtype=np.uint64, buffer=self.index_segment.buf)
+        self.index_header[:] = 0
+        self.index_header[0] = MAGIC
+        self.lock = threading.Lock()
+        self.cameras = {}
+        self.segment_names = {}
+        self.next_id = 0
+        self._publish_index()
+
+    def _publish_index(self):
+        body = json.dumps({"cameras": self.segment_names}).encode()
+        if len(body) > INDEX_BYTES - INDEX_HEADER_WORDS * 8:
+            raise ValueError("Frame store index is full")
+        self.index_header[1] += 1
+        self.index_segment.buf[INDEX_HEADER_WORDS * 8:INDEX_HEADER_WORDS * 8 + len(body)] = body
+        self.index_header[2] = len(body)
+        self.index_header[1] += 1
+
+    def open_camera(self, car_id, camera_type, width, height, channels=4):
+        key = f"{car_id}/{camera_type}"
+        with self.lock:
+            if key in self.cameras:
+                return self.cameras[key]
+            self.next_id += 1
+            camera = SharedCamera.create(f"{self.name}_{os.getpid()}_{self.next_id}", width, height, channels)
+            self.cameras[key] = camera
+            self.segment_names[key] = camera.segment.name.lstrip('/')
+            self._publish_index()
+            return camera
+
+    def close_camera(self, car_id, camera_type):
+        key = f"{car_id}/{camera_type}"
+        with self.lock:
+            camera = self.cameras.pop(key, None)
+            if camera is None:
+                return
+            del self.segment_names[key]
+            self._publish_index()
+        camera.close()
+
+    def close(self):
+        for key in list(self.cameras):
+            car_id, camera_type = key.split('/', 1)
+            self.close_camera(car_id, camera_type)
+        self.index_header[INDEX_CLOSED] = 1
+        self.index_header = None
+        self.index_segment.close()
+        try:
+            self.index_segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class FrameStoreReader:
+    # Reader side, one per HTTP worker process
+    def __init__(self, name=FRAME_STORE_NAME):
+        self.name = name
+        self.index_segment = None
+        self.index_header = None
+        self.generation = None
+        self.segment_names = {}
+        self.cameras = {}
+
+    def _attach_index(self):
+        if self.index_segment is not None and (self.index_header[INDEX_CLOSED]
+                                               or segment_unlinked(self.index_segment)):
+            # The bridge shut down or was restarted; a new bridge publishes a new index
+            self._detach_index()
+        if self.index_segment is None:
+            try:
+                self.index_segment = attach_segment(f"{self.name}_index")
+            except FileNotFoundError:
+                return False
+            self.index_header = np.ndarray((INDEX_HEADER_WORDS,), dtype=np.uint64, buffer=self.index_segment.buf)
+            if self.index_header[INDEX_CLOSED]:
+                # Attached between the closed flag and the unlink
+                self._detach_index()
+                return False
+        return True
+
+    def _detach_index(self):
+        self.index_header = None
+        self.index_segment.close()
+        self.index_segment = None
+        self.generation = None
+        self.segment_names = {}
+
+    def refresh(self):
+        if self._attach_index():
+            for _ in range(100):
+                if int(self.index_header[1]) == self.generation:
+                    break
+                current = read_index(self.index_segment, self.index_header)
+                if current is None:
+                    time.sleep(0.001)
+                    continue
+                self.generation, self.segment_names = current
+                break
+        for key in [k for k in self.cameras if self.segment_names.get(k) != self.cameras[k].segment.name.lstrip('/')]:
+            self.cameras.pop(key).close()
+        return self.segment_names
+
+    def camera_keys(self):
+        return sorted(self.refresh())
+
+    def camera(self, car_id, camera_type):
+        key = f"{car_id}/{camera_type}"
+        name = self.refresh().get(key)
+        if name is None:
+            return None
+        camera = self.cameras.get(key)
+        if camera is None:
+            try:
+                camera = self.cameras[key] = SharedCamera(attach_segment(name))
+            except (FileNotFoundError, ValueError):
+                return None
+        return camera
+
+    def close(self):
+        for camera in self.cameras.values():
+            camera.close()
+        self.cameras = {}
+        if self.index_segment is not None:
+            self._detach_index()
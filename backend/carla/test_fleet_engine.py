@@ -0,0 +1,170 @@
+import itertools
+import sys
+import types
+import unittest
+
+try:
+    import carla  # noqa: F401
+except ImportError:
+    # FleetEngine only sees the world it is given, so an empty stand-in is enough
+    sys.modules['carla'] = types.ModuleType('carla')
+
+import carla_bridge
+
+# Run from backend/carla: python -m unittest test_fleet_engine
+
+
+class Vector:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+
+class Transform:
+    def __init__(self, x=0.0, y=0.0):
+        self.location = Vector(x, y)
+
+
+class Actor:
+    # Per-actor getters are RPCs in CARLA; the engine must read the snapshot instead
+    ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(self.ids)
+        self.is_alive = True
+        self.transform = Transform()
+        self.velocity = Vector()
+        self.callback = None
+
+    def get_transform(self):
+        raise AssertionError("FleetEngine called get_transform on an actor")
+
+    def get_velocity(self):
+        raise AssertionError("FleetEngine called get_velocity on an actor")
+
+    def listen(self, callback):
+        self.callback = callback
+
+    def stop(self):
+        self.callback = None
+
+    def set_autopilot(self, enabled):
+        pass
+
+    def destroy(self):
+        self.is_alive = False
+
+
+class ActorSnapshot:
+    def __init__(self, actor):
+        self.transform = actor.transform
+        self.velocity = actor.velocity
+
+    def get_transform(self):
+        return self.transform
+
+    def get_velocity(self):
+        return self.velocity
+
+
+class WorldSnapshot:
+    def __init__(self, actors):
+        self.actors = {actor.id: ActorSnapshot(actor) for actor in actors if actor.is_alive}
+
+    def find(self, actor_id):
+        return self.actors.get(actor_id)
+
+
+class World:
+    def __init__(self):
+        self.callbacks = {}
+        self.vehicles = []
+
+    def on_tick(self, callback):
+        callback_id = len(self.callbacks) + 1
+        self.callbacks[callback_id] = callback
+        return callback_id
+
+    def remove_on_tick(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def tick(self):
+        snapshot = WorldSnapshot(self.vehicles)
+        for callback in list(self.callbacks.values()):
+            callback(snapshot)
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, *args):
+        self.calls.append(args)
+
+    def add(self, *args):
+        self.calls.append(args)
+
+
+class FleetEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.world = World()
+        self.uploader = Recorder()
+        self.exporter = Recorder()
+        self.board = carla_bridge.TelemetryBoard()
+        self.fleet = carla_bridge.FleetEngine(self.world, agents={}, uploader=self.uploader,
+                                              board=self.board, exporter=self.exporter)
+        self.fleet.start()
+
+    def tearDown(self):
+        self.fleet.shutdown()
+
+    def add_car(self, car_id, x=0.0, y=0.0, speed_ms=0.0):
+        vehicle = Actor()
+        vehicle.transform = Transform(x, y)
+        vehicle.velocity = Vector(x=speed_ms)
+        self.world.vehicles.append(vehicle)
+        return self.fleet.register(car_id, vehicle, Actor(), Actor())
+
+    def test_one_tick_updates_every_car_from_the_snapshot(self):
+        for i in range(200):
+            self.add_car(f"CAR{i}", x=i * 10.0, y=-i * 5.0, speed_ms=i % 7)
+
+        self.world.tick()
+
+        self.assertEqual(self.fleet.stats()['ticks'], 1)
+        self.assertEqual(len(self.board.cars), 200)
+        telemetry = self.fleet.agents['CAR13']['telemetry']
+        self.assertEqual((telemetry['lat'], telemetry['lon']), (-65.0, 130.0))
+        self.assertEqual(telemetry['speed'], round(3.6 * (13 % 7), 2))
+        # The first sample of every car goes to the exporter
+        self.assertEqual(sorted(call[0] for call in self.exporter.calls), sorted(self.fleet.agents))
+
+    def test_audio_is_queued_once_per_interval(self):
+        car_data = self.add_car("CAR1", speed_ms=10.0)
+        car_data['last_audio_time'] -= carla_bridge.AUDIO_INTERVAL
+
+        self.world.tick()
+        self.world.tick()
+
+        # (car_id, speed, previous_speed, stuck_duration)
+        self.assertEqual(self.uploader.calls, [("CAR1", 36.0, 0.0, 0)])
+
+    def test_removed_car_leaves_the_fleet(self):
+        car_data = self.add_car("CAR1")
+        self.add_car("CAR2")
+        self.world.tick()
+
+        self.assertTrue(self.fleet.unregister("CAR1", cleanup=True))
+        self.world.tick()
+
+        self.assertFalse(car_data['vehicle'].is_alive)
+        self.assertEqual(list(self.board.cars), ["CAR2"])
+        self.assertEqual(self.board.changes_since(1)[2], ["CAR1"])
+
+    def test_stop_removes_the_tick_callback(self):
+        self.fleet.stop()
+        self.world.tick()
+        self.assertEqual(self.fleet.stats()['ticks'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
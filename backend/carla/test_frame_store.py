@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+from frame_store import FrameStore, FrameStoreReader
+
+# Run from backend/carla: python -m unittest test_frame_store
+
+
+@unittest.skipIf(sys.version_info < (3, 8), 'the frame store needs multiprocessing.shared_memory')
+class BridgeRestartTest(unittest.TestCase):
+    def setUp(self):
+        self.name = f"test_frames_{os.getpid()}"
+        self.stores = []
+        self.reader = FrameStoreReader(self.name)
+
+    def tearDown(self):
+        self.reader.close()
+        for store in self.stores:
+            store.close()
+
+    def start_bridge(self, *car_ids):
+        store = FrameStore(self.name)
+        self.stores.append(store)
+        for car_id in car_ids:
+            store.open_camera(car_id, 'first_person', 8, 4).write(np.full((4, 8, 4), 7, dtype=np.uint8))
+        return store
+
+    def test_reader_follows_a_restarted_bridge(self):
+        store = self.start_bridge('CAR1')
+        self.assertEqual(self.reader.camera_keys(), ['CAR1/first_person'])
+
+        self.stores.remove(store)
+        store.close()
+        self.assertEqual(self.reader.camera_keys(), [])
+
+        self.start_bridge('CAR2')
+        self.assertEqual(self.reader.camera_keys(), ['CAR2/first_person'])
+        seq, frame = self.reader.camera('CAR2', 'first_person').latest()
+        self.assertEqual((seq, int(frame[0, 0, 0])), (1, 7))
+
+    def test_reader_follows_a_bridge_restarted_after_a_crash(self):
+        # The first store is never closed, as if its bridge had been killed
+        self.start_bridge('CAR1')
+        old_camera = self.reader.camera('CAR1', 'first_person')
+        self.assertFalse(old_camera.closed)
+
+        self.start_bridge('CAR2')
+        self.assertEqual(self.reader.camera_keys(), ['CAR2/first_person'])
+        # Streams still holding the old camera see it closed and end
+        self.assertTrue(old_camera.closed)
+        self.assertIsNone(self.reader.camera('CAR1', 'first_person'))
+
+    def test_reader_follows_a_bridge_whose_segments_were_unlinked(self):
+        # After a crash the resource tracker unlinks the segments without
+        # setting any closed flag
+        store = self.start_bridge('CAR1')
+        old_camera = self.reader.camera('CAR1', 'first_person')
+        for segment in [store.index_segment] + [camera.segment for camera in store.cameras.values()]:
+            segment.unlink()
+        self.assertEqual(self.reader.camera_keys(), [])
+        self.assertTrue(old_camera.closed)
+
+        self.start_bridge('CAR2')
+        self.assertEqual(self.reader.camera_keys(), ['CAR2/first_person'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import gzip
+import http.server
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+
+try:
+    import carla  # noqa: F401
+except ImportError:
+    # The exporter never talks to the simulator, so an empty stand-in is enough
+    sys.modules['carla'] = types.ModuleType('carla')
+
+import carla_bridge
+
+# Run from backend/carla: python -m unittest test_telemetry_export
+
+TELEMETRY_SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'telemetryService.js')
+
+# Decodes a batch read from stdin with the Express decoder. The database module
+# is replaced in the require cache, so pg does not have to be installed.
+DECODE_SCRIPT = """
+const path = require("path");
+const service = path.resolve(process.argv[1]);
+const database = require.resolve(path.join(path.dirname(service), "../config/database"));
+require.cache[database] = { id: database, filename: database, loaded: true, exports: {} };
+const { decodeTelemetryBatch } = require(service);
+let input = "";
+process.stdin.on("data", (chunk) => (input += chunk));
+process.stdin.on("end", () => console.log(JSON.stringify(decodeTelemetryBatch(JSON.parse(input)))));
+"""
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class StubExpressHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        batch = json.loads(gzip.decompress(self.rfile.read(int(self.headers['Content-Length']))))
+        server = self.server
+        with server.lock:
+            if server.down or server.failing_cars & set(batch['cars']):
+                status = 500
+            else:
+                status = 201
+                server.batches.append(batch)
+        body = b'{}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubExpress(http.server.ThreadingHTTPServer):
+    # Stands in for POST /api/telemetry/batch: stores every batch, and answers
+    # 500 while down or for batches containing one of failing_cars
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubExpressHandler)
+        self.lock = threading.Lock()
+        self.batches = []
+        self.failing_cars = set()
+        self.down = False
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/api/telemetry/batch"
+
+    def delivered_cars(self):
+        with self.lock:
+            return sorted(car_id for batch in self.batches for car_id in batch['cars'])
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+def samples_for(car_id, count=3, start=1000.0):
+    return [(car_id, start + i * 0.5, -4321.123456 + i, 1234.5 - i * 0.25, 30.0 + i) for i in range(count)]
+
+
+class EncodeTelemetryBatchTest(unittest.TestCase):
+    def test_batch_layout(self):
+        samples = samples_for('CAR1') + samples_for('CAR2', count=2, start=999.5)
+        batch = json.loads(gzip.decompress(carla_bridge.encode_telemetry_batch(samples)))
+        self.assertEqual(batch['v'], 1)
+        self.assertEqual(batch['t0'], 999.5)
+        self.assertEqual(batch['samples'], 5)
+        self.assertEqual(sorted(batch['cars']), ['CAR1', 'CAR2'])
+        # First entry is absolute, the rest are deltas at the batch scales
+        self.assertEqual(batch['cars']['CAR1']['t'], [500, 500, 500])
+        self.assertEqual(batch['cars']['CAR1']['lon'], [1234500000, -250000, -250000])
+
+    @unittest.skipIf(shutil.which('node') is None, 'node is not installed')
+    def test_round_trip_through_express_decoder(self):
+        # CARLA world coordinates run to thousands of meters
+        samples = samples_for('CAR1', count=20) + samples_for('CAR2', count=7, start=1003.25)
+        body = gzip.decompress(carla_bridge.encode_telemetry_batch(samples))
+        result = subprocess.run(['node', '-e', DECODE_SCRIPT, TELEMETRY_SERVICE], input=body,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        rows = json.loads(result.stdout)
+        decoded = sorted(zip(rows['carIds'], rows['timestamps'], rows['latitudes'], rows['longitudes'], rows['speeds']))
+        self.assertEqual(len(decoded), len(samples))
+        for actual, expected in zip(decoded, sorted(samples)):
+            self.assertEqual(actual[0], expected[0])
+            for value, original in zip(actual[1:], expected[1:]):
+                self.assertAlmostEqual(value, original, places=6)
+
+
+class SpoolReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubExpress()
+        self.spool_dir = tempfile.mkdtemp(prefix='telemetry_spool_')
+        self.exporter = carla_bridge.TelemetryExporter(
+            url=self.server.url, interval=0.05, spool_dir=self.spool_dir,
+            retry_base_delay=0.01, drain_interval=0.1, spool_max_failures=3)
+        os.makedirs(self.exporter.quarantine_dir)
+        self.session = carla_bridge.keepalive_session()
+
+    def tearDown(self):
+        self.exporter.stop()
+        self.session.close()
+        self.server.close()
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+
+    def spool(self, car_id):
+        samples = samples_for(car_id)
+        self.exporter._spool(carla_bridge.encode_telemetry_batch(samples), len(samples))
+        # Names are nanosecond timestamps; keep them distinct and ordered
+        time.sleep(0.001)
+
+    def spooled(self, directory=None):
+        return [entry.name for entry in self.exporter._spool_files(directory)]
+
+    def test_failing_batch_does_not_block_later_batches(self):
+        self.server.failing_cars.add('BAD')
+        for car_id in ('BAD', 'CAR1', 'CAR2'):
+            self.spool(car_id)
+
+        self.exporter._drain_spool(self.session)
+        self.assertEqual(self.server.delivered_cars(), ['CAR1', 'CAR2'])
+        [name] = self.spooled()
+        self.assertEqual(carla_bridge.parse_spool_file_name(name)[1:], (3, 1))
+
+        for _ in range(2):
+            self.exporter._drain_spool(self.session)
+        self.assertEqual(self.spooled(), [])
+        self.assertEqual(len(self.spooled(self.exporter.quarantine_dir)), 1)
+        self.assertEqual(self.exporter.stats()['quarantined_batches'], 1)
+
+        # Quarantined batches are not sent again
+        self.server.failing_cars.clear()
+        self.exporter._drain_spool(self.session)
+        self.assertEqual(self.server.delivered_cars(), ['CAR1', 'CAR2'])
+
+    def test_unreachable_server_leaves_spool_untouched(self):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        self.exporter.url = f"http://127.0.0.1:{port}/api/telemetry/batch"
+        for car_id in ('CAR1', 'CAR2'):
+            self.spool(car_id)
+        before = self.spooled()
+
+        self.exporter._drain_spool(self.session)
+        self.assertEqual(self.spooled(), before)
+        self.assertEqual(self.exporter.stats()['failures'], 1)
+
+    def test_worker_replays_spool_without_new_posts(self):
+        self.server.down = True
+        self.exporter.start()
+        for sample in samples_for('CAR1'):
+            self.exporter.add(*sample)
+        self.assertTrue(wait_until(lambda: self.spooled()))
+
+        # Nothing else is added, so only the drain timer can deliver it
+        self.server.down = False
+        self.assertTrue(wait_until(lambda: self.server.delivered_cars() == ['CAR1'] and not self.spooled()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import cv2
+from flask import abort, request
+
+# MJPEG helpers shared by the bridge's in-process video routes and
+# frame_server.py, so both endpoints take the same query parameters and
+# encode frames the same way.
+
+JPEG_QUALITY = 70
+VARIANT_TTL = 10.0
+MJPEG_MIMETYPE = 'multipart/x-mixed-replace; boundary=frame'
+
+
+def stream_params():
+    # Validates ?fps=, ?scale= and ?quality= of the current request and returns
+    # (min_interval, scale, quality)
+    fps = request.args.get('fps', type=float)
+    if fps is not None and fps <= 0:
+        abort(400, description="fps must be positive.")
+    scale = request.args.get('scale', 1.0, type=float)
+    if not 0.05 <= scale <= 1.0:
+        abort(400, description="scale must be between 0.05 and 1.0.")
+    # Rounded so near-identical requests share one encoded variant
+    scale = round(scale, 2)
+    quality = request.args.get('quality', JPEG_QUALITY, type=int)
+    if not 1 <= quality <= 100:
+        abort(400, description="quality must be between 1 and 100.")
+    min_interval = 1.0 / fps if fps else 0.0
+    return min_interval, scale, quality
+
+
+def encode_jpeg(raw, scale, quality):
+    # raw is a BGRA camera frame; returns the JPEG bytes, or None if encoding failed
+    img = raw[:, :, :3]
+    if scale != 1.0:
+        size = (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale)))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    ret, jpeg = cv2.imencode('.jpeg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return jpeg.tobytes() if ret else None
+
+
+def mjpeg_part(jpeg):
+    return b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+
+
+class VariantCache:
+    # Encoded frames per variant key, each {'seq', 'jpeg', 'lock', 'last_used'}.
+    # Variants nobody asked for in VARIANT_TTL are dropped. Not thread-safe;
+    # callers that share it between threads hold their own lock around get().
+    def __init__(self, ttl=VARIANT_TTL):
+        self.ttl = ttl
+        self.variants = {}
+        self.last_sweep = time.time()
+
+    def __len__(self):
+        return len(self.variants)
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        if now - self.last_sweep >= self.ttl:
+            for stale in [k for k, v in self.variants.items() if now - v['last_used'] >= self.ttl]:
+                del self.variants[stale]
+            self.last_sweep = now
+        variant = self.variants.get(key)
+        if variant is None:
+            variant = self.variants[key] = {'seq': 0, 'jpeg': None, 'lock': threading.Lock(), 'last_used': now}
+        variant['last_used'] = now
+        return variant
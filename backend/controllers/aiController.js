@@ -1,5 +1,4 @@
-const fs = require("fs");
-const { analyzeAudio } = require("../services/aiService");
+const { analyzeAudio, getInferenceHealth } = require("../services/aiService");
 const { logAudioAlert } = require("../services/alertService");
 
 /**
@@ -10,11 +9,9 @@ async function processAudio(req, res) {
 		return res.status(400).json({ message: "No audio file was uploaded." });
 	}
 
-	const tempFilePath = req.file.path;
-
 	try {
-		// Call the AI service for analysis
-		const predictionResult = await analyzeAudio(tempFilePath);
+		// Call the AI service for analysis on the in-memory upload
+		const predictionResult = await analyzeAudio(req.file.buffer);
 
 		if (predictionResult && predictionResult.prediction) {
 
@@ -44,16 +41,26 @@ async function processAudio(req, res) {
 		return res.status(500).json({
 			message: "An internal error occurred during audio analysis.",
 		});
-	} finally {
-		// Clean up the temporary file
-		fs.unlink(tempFilePath, (err) => {
-			if (err) {
-				console.error(`[aiController] Failed to delete temporary file: ${tempFilePath}`, err);
-			}
+	}
+}
+
+/**
+ * Reports the health of the inference daemon.
+ */
+async function getAiHealth(req, res) {
+	try {
+		const health = await getInferenceHealth();
+		return res.status(200).json(health);
+	} catch (error) {
+		console.error("[aiController] Inference daemon health check failed:", error.message);
+		return res.status(503).json({
+			status: "unavailable",
+			message: error.message,
 		});
 	}
 }
 
 module.exports = {
 	processAudio,
+	getAiHealth,
 };
\ No newline at end of file
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+import tempfile
+import time
+import wave
+
+# Repeated clips must not be served from the feature cache while timing
+os.environ["FEATURE_CACHE_MAX_MB"] = "0"
+
+import numpy as np
+import torch
+
+import predict
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(ML_DIR, "accident_model.pth")
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+
+# (name, sample rate, channels, seconds)
+SYNTHETIC_CLIPS = (
+    ("wav16k_mono_2s", 16000, 1, 2.0),
+    ("wav16k_mono_0.5s", 16000, 1, 0.5),
+    ("wav44k_stereo_2s", 44100, 2, 2.0),
+    ("wav22k_mono_10s", 22050, 1, 10.0),
+)
+
+
+# Synthetic Audio
+# Engine-like harmonics plus noise and one loud burst, written as PCM16 WAV
+# with the standard library so the suite needs no dataset or network access.
+def write_synthetic_clip(path, sample_rate, channels, seconds, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * 180 * t) + 0.1 * np.sin(2 * np.pi * 360 * t)
+    signal += 0.05 * rng.standard_normal(len(t))
+    burst = slice(len(t) // 3, len(t) // 3 + sample_rate // 8)
+    signal[burst] += 0.5 * rng.standard_normal(len(signal[burst]))
+    samples = (np.clip(signal, -1.0, 1.0) * 32767).astype("<i2")
+    frames = np.repeat(samples[:, None], channels, axis=1)
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frames.tobytes())
+    return path
+
+
+def measure(fn, iterations, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples = np.array(samples)
+    return {
+        "iterations": iterations,
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p90_ms": round(float(np.percentile(samples, 90)), 4),
+        "min_ms": round(float(samples.min()), 4),
+    }
+
+
+def cold_start(model_path, clip_path, iterations):
+    # A fresh interpreter per clip, exactly what one-off predict.py calls pay
+    command = [sys.executable, os.path.join(ML_DIR, "predict.py"), model_path, clip_path]
+    return measure(lambda: subprocess.run(command, capture_output=True, check=True), iterations, warmup=1)
+
+
+def run_suite(model_path, iterations=20, cold_iterations=3):
+    results = {}
+    model = predict.load_model(model_path)
+
+    with tempfile.TemporaryDirectory() as clip_dir:
+        clips = {
+            name: write_synthetic_clip(os.path.join(clip_dir, name + ".wav"), sr, channels, seconds, seed=i)
+            for i, (name, sr, channels, seconds) in enumerate(SYNTHETIC_CLIPS)
+        }
+        reference = clips["wav16k_mono_2s"]
+        waveform = predict.load_audio(reference)
+
+        if cold_iterations:
+            results["cold_start.predict_cli"] = cold_start(model_path, reference, cold_iterations)
+        results["warm.model_load"] = measure(lambda: predict.load_model(model_path), max(3, iterations // 4))
+
+        for name, path in clips.items():
+            results[f"decode.{name}"] = measure(lambda: predict.load_audio(path), iterations)
+            results[f"audio_to_melspec.{name}"] = measure(lambda: predict.audio_to_melspec(path), iterations)
+
+        for backend in ("numpy", "librosa"):
+            results[f"mel.{backend}.batch_1"] = measure(
+                lambda: predict.melspec_batch([waveform], backend=backend), iterations)
+            results[f"mel.{backend}.batch_16"] = measure(
+                lambda: predict.melspec_batch([waveform] * 16, backend=backend), max(3, iterations // 4))
+
+        spec = predict.audio_to_melspec(reference)
+        for batch_size in BATCH_SIZES:
+            inputs = torch.from_numpy(np.stack([spec] * batch_size).astype(np.float32)).unsqueeze(1)
+
+            def forward():
+                with torch.no_grad():
+                    model(inputs)
+
+            timing = measure(forward, max(3, iterations // max(1, batch_size // 8)))
+            timing["per_clip_ms"] = round(timing["p50_ms"] / batch_size, 4)
+            results[f"forward.batch_{batch_size}"] = timing
+
+        for name, path in clips.items():
+            results[f"predict.{name}"] = measure(lambda: predict.predict(model_path, path, model=model), iterations)
+        batch_paths = [reference] * 16
+        timing = measure(lambda: predict.predict_batch(model_path, batch_paths, model=model), max(3, iterations // 4))
+        timing["per_clip_ms"] = round(timing["p50_ms"] / len(batch_paths), 4)
+        results["predict_batch.wav16k_mono_2s.batch_16"] = timing
+
+    return results
+
+
+# Baseline Comparison
+# A metric regresses when its p50 grew by more than `threshold` (relative) and
+# by more than `min_delta_ms` (absolute), so sub-millisecond jitter is ignored.
+def compare(results, baseline, threshold=0.15, min_delta_ms=0.5):
+    regressions = []
+    improvements = []
+    for name, timing in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        before, after = previous["p50_ms"], timing["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        entry = {"metric": name, "baseline_p50_ms": before, "p50_ms": after, "change": round(change, 4)}
+        if change > threshold and after - before > min_delta_ms:
+            regressions.append(entry)
+        elif change < -threshold:
+            improvements.append(entry)
+    return {"threshold": threshold, "regressions": regressions, "improvements": improvements}
+
+
+#  Main Execution Block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the audio classification pipeline on synthetic clips.")
+    parser.add_argument("--model-path", type=str, default=DEFAULT_MODEL_PATH,
+                        help="Model to benchmark (.pth state dict or .pt TorchScript).")
+    parser.add_argument("--output", type=str, default="benchmark_results.json",
+                        help="Where to write the machine-readable results.")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="Earlier results file to compare against; exits 1 on regressions.")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Relative p50 slowdown that counts as a regression.")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed iterations per metric.")
+    parser.add_argument("--cold-iterations", type=int, default=3,
+                        help="Fresh-process runs for the cold start metric (0 skips it).")
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads before timing.")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model_path):
+        print(json.dumps({"error": f"Model file not found: {args.model_path}"}), file=sys.stderr)
+        sys.exit(1)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "model_path": args.model_path,
+            "mel_backend": predict.MEL_BACKEND,
+        },
+        "results": run_suite(args.model_path, iterations=args.iterations, cold_iterations=args.cold_iterations),
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        report["comparison"] = compare(report["results"], baseline, threshold=args.threshold)
+        if report["comparison"]["regressions"]:
+            exit_code = 1
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, timing in report["results"].items():
+        print(f"{name:45s} p50 {timing['p50_ms']:10.3f} ms")
+    if "comparison" in report:
+        for entry in report["comparison"]["regressions"]:
+            print(f"REGRESSION: {entry['metric']} {entry['baseline_p50_ms']} -> {entry['p50_ms']} ms "
+                  f"({entry['change']:+.1%})")
+    sys.exit(exit_code)
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from predict import AudioCRNN, load_model, extract_features
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg')
+
+
+# Conv-BN Fusion
+# Folds bn1, bn2 and bn3 into conv1, conv2 and conv3 so each block is a single
+# convolution at inference time. The BatchNorm layers become identities.
+def fuse_conv_bn(model):
+    for conv_name, bn_name in (('conv1', 'bn1'), ('conv2', 'bn2'), ('conv3', 'bn3')):
+        conv, bn = getattr(model, conv_name), getattr(model, bn_name)
+        setattr(model, conv_name, fuse_conv_bn_eval(conv, bn))
+        setattr(model, bn_name, nn.Identity())
+    return model
+
+
+def build_optimized_model(model_path):
+    model = AudioCRNN(num_classes=3)
+    model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
+    model.eval()
+    model = fuse_conv_bn(model)
+    # Dynamic quantization: int8 weights, activations quantized on the fly
+    model = torch.ao.quantization.quantize_dynamic(model, {nn.GRU, nn.Linear}, dtype=torch.qint8)
+    example = torch.zeros(1, 1, 128, 128)
+    with torch.no_grad():
+        scripted = torch.jit.trace(model, example)
+    return torch.jit.freeze(scripted.eval()) if hasattr(torch.jit, 'freeze') else scripted
+
+
+# Reference Set
+# Spectrograms of the audio files under reference_dir, or seeded synthetic
+# clips (tones, noise bursts and silence) when no directory is given.
+def reference_specs(reference_dir=None, limit=256, seed=0):
+    if reference_dir:
+        paths = []
+        for root, _, files in os.walk(reference_dir):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+        paths = sorted(paths)[:limit]
+        specs = [spec for spec in extract_features(paths) if spec is not None]
+        if specs:
+            return np.stack(specs).astype(np.float32)
+
+    rng = np.random.default_rng(seed)
+    sr = 16000
+    t = np.arange(2 * sr) / sr
+    clips = []
+    for i in range(min(limit, 64)):
+        kind = i % 3
+        if kind == 0:
+            clip = 0.3 * np.sin(2 * np.pi * rng.uniform(80, 4000) * t)
+        elif kind == 1:
+            clip = rng.uniform(0.01, 0.5) * rng.standard_normal(len(t))
+            clip[int(rng.uniform(0, 1.5) * sr):][:sr // 4] *= 8
+        else:
+            clip = 0.001 * rng.standard_normal(len(t))
+        clips.append(clip.astype(np.float32))
+    return np.stack(extract_features(clips)).astype(np.float32)
+
+
+def parity_report(eager, optimized, specs):
+    inputs = torch.from_numpy(specs).unsqueeze(1)
+    with torch.no_grad():
+        eager_probs = torch.softmax(eager(inputs), dim=1).numpy()
+        optimized_probs = torch.softmax(optimized(inputs), dim=1).numpy()
+    agreement = float(np.mean(eager_probs.argmax(axis=1) == optimized_probs.argmax(axis=1)))
+    return {
+        "clips": int(len(specs)),
+        "top1_agreement": round(agreement, 4),
+        "max_probability_diff": round(float(np.max(np.abs(eager_probs - optimized_probs))), 6),
+    }
+
+
+def time_forward(model, batch_size, iterations=20):
+    inputs = torch.rand(batch_size, 1, 128, 128)
+    with torch.no_grad():
+        for _ in range(3):
+            model(inputs)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model(inputs)
+    return round((time.perf_counter() - start) / iterations * 1000.0, 3)
+
+
+# Peak RSS of a fresh interpreter that loads the model and runs one forward pass
+def measure_rss_mb(model_path):
+    script = (
+        "import resource, sys, torch\n"
+        "sys.path.insert(0, sys.argv[2])\n"
+        "from predict import load_model\n"
+        "model = load_model(sys.argv[1])\n"
+        "with torch.no_grad():\n"
+        "    model(torch.zeros(1, 1, 128, 128))\n"
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script, model_path, os.path.dirname(os.path.abspath(__file__))],
+        capture_output=True, text=True, check=True,
+    )
+    return round(float(output.stdout.strip().splitlines()[-1]), 1)
+
+
+#  Main Execution Block
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export a fused, int8-quantized TorchScript build of AudioCRNN for CPU inference.")
+    parser.add_argument("model_path", type=str, help="Path to the trained .pth model file.")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Where to write the TorchScript artifact (default: <model>_optimized.pt).")
+    parser.add_argument("--reference-dir", type=str, default=None,
+                        help="Directory of audio clips used for the parity check (default: synthetic clips).")
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="Lowest acceptable top-1 agreement with the eager model.")
+    parser.add_argument("--force", action="store_true", help="Write the artifact even if the parity check fails.")
+    parser.add_argument("--skip-rss", action="store_true", help="Skip the resident memory measurement.")
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model_path):
+        print(json.dumps({"error": f"Model file not found: {args.model_path}"}), file=sys.stderr)
+        sys.exit(1)
+
+    output_path = args.output or os.path.splitext(args.model_path)[0] + "_optimized.pt"
+    eager = load_model(args.model_path)
+    optimized = build_optimized_model(args.model_path)
+
+    report = {"model_path": args.model_path, "output_path": output_path}
+    report["parity"] = parity_report(eager, optimized, reference_specs(args.reference_dir))
+    report["latency_ms"] = {
+        f"batch_{batch_size}": {
+            "eager": time_forward(eager, batch_size),
+            "optimized": time_forward(optimized, batch_size),
+        }
+        for batch_size in (1, 16)
+    }
+    report["torch_threads"] = torch.get_num_threads()
+
+    passed = report["parity"]["top1_agreement"] >= args.min_agreement
+    report["parity"]["passed"] = passed
+    if passed or args.force:
+        optimized.save(output_path)
+        report["saved"] = True
+        if not args.skip_rss:
+            report["peak_rss_mb"] = {
+                "eager": measure_rss_mb(args.model_path),
+                "optimized": measure_rss_mb(output_path),
+            }
+    else:
+        report["saved"] = False
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if passed else 1)
@@ -2,11 +2,29 @@ import os
 import sys
 import json
 import argparse
-import numpy as np
-import torch
-import torch.nn as nn
-import librosa
+import collections
+import contextlib
+import hashlib
+import io
+import struct
+import tempfile
+import threading
+import time
 import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+
+
+# Timed on its own so cold-start reports can show what importing torch costs
+def _import_torch():
+    started = time.perf_counter()
+    import torch
+    import torch.nn
+    return torch, (time.perf_counter() - started) * 1000.0
+
+
+torch, TORCH_IMPORT_MS = _import_torch()
+nn = torch.nn
 
 # Suppress warnings from librosa
 warnings.filterwarnings('ignore', category=UserWarning, module='librosa')
@@ -42,18 +60,232 @@ class AudioCRNN(nn.Module):
         return x
 
 
-# Pre-processing Function
-def audio_to_melspec(audio_path, sr=16000, n_mels=128, n_fft=2048, hop_length=512, fixed_length=128):
+# librosa is only imported when a clip actually has to be decoded from a file
+def _librosa():
+    import librosa
+    return librosa
+
+
+# Mel Front End
+# NumPy implementation of librosa.feature.melspectrogram followed by
+# librosa.power_to_db(ref=np.max) for one fixed configuration. The periodic Hann
+# window and the Slaney-normalised mel filterbank are built once per
+# configuration, and whole batches of clips go through a single strided rfft
+# and a single matrix product. Output matches librosa >= 0.10 (center=True,
+# pad_mode='constant') to within MEL_PARITY_ATOL absolute difference on the
+# normalised spectrogram returned by audio_to_melspec; check_mel_parity()
+# measures this for a given waveform. Set MEL_BACKEND=librosa to use librosa.
+MEL_BACKEND = os.getenv("MEL_BACKEND", "numpy")
+MEL_PARITY_ATOL = 1e-4
+
+
+def hz_to_mel(freqs):
+    freqs = np.asarray(freqs, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    mels = freqs / f_sp
+    log_region = freqs >= min_log_hz
+    mels[log_region] = min_log_mel + np.log(freqs[log_region] / min_log_hz) / logstep
+    return mels
+
+
+def mel_to_hz(mels):
+    mels = np.asarray(mels, dtype=np.float64)
+    f_sp = 200.0 / 3
+    min_log_hz = 1000.0
+    min_log_mel = min_log_hz / f_sp
+    logstep = np.log(6.4) / 27.0
+    freqs = f_sp * mels
+    log_region = mels >= min_log_mel
+    freqs[log_region] = min_log_hz * np.exp(logstep * (mels[log_region] - min_log_mel))
+    return freqs
+
+
+def mel_filterbank(sr, n_fft, n_mels):
+    fft_freqs = np.fft.rfftfreq(n_fft, d=1.0 / sr)
+    mel_freqs = mel_to_hz(np.linspace(hz_to_mel([0.0])[0], hz_to_mel([sr / 2.0])[0], n_mels + 2))
+    fdiff = np.diff(mel_freqs)
+    ramps = np.subtract.outer(mel_freqs, fft_freqs)
+    lower = -ramps[:-2] / fdiff[:-1, None]
+    upper = ramps[2:] / fdiff[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    enorm = 2.0 / (mel_freqs[2:n_mels + 2] - mel_freqs[:n_mels])
+    return (weights * enorm[:, None]).astype(np.float32)
+
+
+class MelFrontEnd:
+    def __init__(self, sr=16000, n_mels=128, n_fft=2048, hop_length=512, top_db=80.0, amin=1e-10):
+        self.sr = sr
+        self.n_mels = n_mels
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.top_db = top_db
+        self.amin = amin
+        self.window = (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+        self.mel_basis_t = np.ascontiguousarray(mel_filterbank(sr, n_fft, n_mels).T)
+
+    def num_frames(self, num_samples):
+        return 1 + num_samples // self.hop_length
+
+    def mel_power(self, waveforms):
+        # waveforms: (N, samples) float32, zero-padded on the right to a common length
+        pad = self.n_fft // 2
+        padded = np.pad(waveforms, ((0, 0), (pad, pad)), mode='constant')
+        n_frames = 1 + (padded.shape[1] - self.n_fft) // self.hop_length
+        stride_clip, stride_sample = padded.strides
+        frames = np.lib.stride_tricks.as_strided(
+            padded,
+            shape=(padded.shape[0], n_frames, self.n_fft),
+            strides=(stride_clip, self.hop_length * stride_sample, stride_sample),
+            writeable=False,
+        )
+        # (N, frames, n_mels) -> (N, n_mels, frames)
+        return self.frames_to_mel(frames).transpose(0, 2, 1)
+
+    def frames_to_mel(self, frames):
+        # frames: (..., n_fft) raw samples -> (..., n_mels) mel power
+        spectrum = np.fft.rfft(frames * self.window, axis=-1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        return np.matmul(power, self.mel_basis_t)
+
+    def power_to_db(self, mel):
+        log_spec = 10.0 * np.log10(np.maximum(self.amin, mel))
+        log_spec -= 10.0 * np.log10(max(self.amin, float(mel.max())))
+        return np.maximum(log_spec, log_spec.max() - self.top_db)
+
+    def melspec_db(self, waveforms):
+        lengths = [len(w) for w in waveforms]
+        batch = np.zeros((len(waveforms), max(lengths)), dtype=np.float32)
+        for i, waveform in enumerate(waveforms):
+            batch[i, :len(waveform)] = waveform
+        mel_power = self.mel_power(batch)
+
+        specs = []
+        for i, length in enumerate(lengths):
+            # Frames past the end of a shorter clip do not exist in librosa's output
+            specs.append(self.power_to_db(mel_power[i, :, :self.num_frames(length)]))
+        return specs
+
+
+_mel_frontends = {}
+
+
+def get_mel_frontend(sr=16000, n_mels=128, n_fft=2048, hop_length=512):
+    key = (sr, n_mels, n_fft, hop_length)
+    if key not in _mel_frontends:
+        _mel_frontends[key] = MelFrontEnd(sr=sr, n_mels=n_mels, n_fft=n_fft, hop_length=hop_length)
+    return _mel_frontends[key]
+
+
+# Audio Loading
+# `audio` is a path to an audio file, the raw bytes of an encoded file, or a
+# mono waveform already sampled at `sr`. 16-bit PCM or 32-bit float mono WAV at
+# `sr` is parsed directly with np.frombuffer, with no resampling; everything
+# else goes through librosa.
+# Bytes read ahead of the samples for the RIFF header and any metadata chunks
+WAV_HEADER_BYTES = 64 * 1024
+
+
+def parse_wav(data, sr=16000, max_samples=None):
+    # Returns the samples of a mono PCM16/float32 WAV at `sr`, or None if the
+    # data needs the general decoder
+    view = memoryview(data)
+    if len(view) < 12 or bytes(view[0:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        return None
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        size = int.from_bytes(view[pos + 4:pos + 8], "little")
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            if size < 16:
+                return None
+            format_tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", view, body)
+            if format_tag == 0xFFFE and size >= 26:
+                # WAVE_FORMAT_EXTENSIBLE: the real format is the subformat GUID prefix
+                format_tag = struct.unpack_from("<H", view, body + 24)[0]
+            fmt = (format_tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            format_tag, channels, rate, bits = fmt
+            if channels != 1 or rate != sr:
+                return None
+            if format_tag == 1 and bits == 16:
+                dtype = np.dtype("<i2")
+            elif format_tag == 3 and bits == 32:
+                dtype = np.dtype("<f4")
+            else:
+                return None
+            count = min(size, len(view) - body) // dtype.itemsize
+            if max_samples is not None:
+                count = min(count, max_samples)
+            samples = np.frombuffer(view, dtype=dtype, count=count, offset=body)
+            if dtype.kind == "i":
+                # Same scaling soundfile applies when librosa reads PCM16
+                return samples.astype(np.float32) / 32768.0
+            return samples
+        pos = body + size + (size & 1)
+    return None
+
+
+def decode_audio_bytes(data, sr=16000, duration=2.0):
+    max_samples = int(sr * duration) if duration else None
+    audio = parse_wav(data, sr=sr, max_samples=max_samples)
+    if audio is not None:
+        return audio
+    try:
+        audio, _ = _librosa().load(io.BytesIO(data), sr=sr, duration=duration)
+        return audio
+    except Exception:
+        # Decoders that need a real file (e.g. audioread for mp3/m4a)
+        with tempfile.NamedTemporaryFile(suffix=".audio") as f:
+            f.write(data)
+            f.flush()
+            audio, _ = _librosa().load(f.name, sr=sr, duration=duration)
+            return audio
+
+
+def read_wav(audio_path, sr=16000, max_samples=None):
+    # parse_wav on just the header and the first max_samples frames of the file
+    with open(audio_path, "rb") as f:
+        if max_samples is None:
+            return parse_wav(f.read(), sr=sr)
+        limit = WAV_HEADER_BYTES + max_samples * 4
+        data = f.read(limit)
+        if len(data) < limit:
+            return parse_wav(data, sr=sr, max_samples=max_samples)
+        audio = parse_wav(data, sr=sr, max_samples=max_samples)
+        if audio is None or len(audio) == max_samples:
+            return audio
+        # The data chunk starts past WAV_HEADER_BYTES; read the rest
+        return parse_wav(data + f.read(), sr=sr, max_samples=max_samples)
+
+
+def load_audio(audio, sr=16000, duration=2.0):
     try:
-        audio, _ = librosa.load(audio_path, sr=sr, duration=2.0)
+        if isinstance(audio, np.ndarray):
+            audio = np.asarray(audio, dtype=np.float32).reshape(-1)[:int(sr * duration)]
+        elif isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = decode_audio_bytes(audio, sr=sr, duration=duration)
+        else:
+            audio_path = audio
+            audio = None
+            if str(audio_path).lower().endswith(".wav"):
+                audio = read_wav(audio_path, sr=sr, max_samples=int(sr * duration))
+            if audio is None:
+                audio, _ = _librosa().load(audio_path, sr=sr, duration=duration)
         if len(audio) == 0:
             return None
     except Exception:
         return None
+    return audio
 
-    mel_spec = librosa.feature.melspectrogram(y=audio, sr=sr, n_mels=n_mels, n_fft=n_fft, hop_length=hop_length)
-    mel_spec_db = librosa.power_to_db(mel_spec, ref=np.max)
 
+def normalize_melspec(mel_spec_db, fixed_length=128):
     if mel_spec_db.shape[1] > fixed_length:
         mel_spec_db = mel_spec_db[:, :fixed_length]
     else:
@@ -68,48 +300,1195 @@ def audio_to_melspec(audio_path, sr=16000, n_mels=128, n_fft=2048, hop_length=51
     return mel_spec_db
 
 
-# Prediction Function
-def predict(model_path, audio_path):
-    class_map = {0: 'glass_break', 1: 'traffic', 2: 'car_crash'}
+def melspec_batch(waveforms, sr=16000, n_mels=128, n_fft=2048, hop_length=512, fixed_length=128, backend=None):
+    backend = backend or MEL_BACKEND
+    if not waveforms:
+        return []
+    if backend == "librosa":
+        librosa = _librosa()
+        specs = []
+        for audio in waveforms:
+            mel_spec = librosa.feature.melspectrogram(y=audio, sr=sr, n_mels=n_mels, n_fft=n_fft, hop_length=hop_length)
+            specs.append(librosa.power_to_db(mel_spec, ref=np.max))
+    else:
+        specs = get_mel_frontend(sr=sr, n_mels=n_mels, n_fft=n_fft, hop_length=hop_length).melspec_db(waveforms)
+    return [normalize_melspec(spec, fixed_length) for spec in specs]
+
+
+# Stage Timing
+# Opt-in wall-clock timing of the inference stages (torch import, model load,
+# cache lookup, decode, mel, forward). A StageTimer is threaded through feature
+# extraction and classification; NULL_TIMER makes those calls free when timing
+# is off. LatencyHistogram keeps a bounded window of samples per stage for the
+# daemon's percentile summaries.
+class StageTimer:
+    def __init__(self):
+        self.stages = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000.0
+
+    def report(self, batch_size=1):
+        report = {
+            "stages_ms": {name: round(ms, 3) for name, ms in self.stages.items()},
+            "total_ms": round(sum(self.stages.values()), 3),
+            "batch_size": batch_size,
+        }
+        report.update(process_stats())
+        return report
+
+
+class _NullTimer:
+    def stage(self, name):
+        return contextlib.nullcontext()
 
-    model = AudioCRNN(num_classes=3)
-    try:
-        model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
-    except FileNotFoundError:
-        return {"error": f"Model file not found at {model_path}"}
-    model.eval()
 
-    # Pre-process audio
-    spec = audio_to_melspec(audio_path)
-    if spec is None:
-        return {"error": f"Failed to process audio file at {audio_path}"}
+NULL_TIMER = _NullTimer()
 
-    # Perform prediction
+
+def peak_rss_mb():
     try:
-        spec_tensor = torch.tensor(spec, dtype=torch.float32).unsqueeze(0).unsqueeze(0)
-        output = model(spec_tensor)
-        probabilities = torch.softmax(output, dim=1).detach().numpy()[0]
-        max_prob_idx = np.argmax(probabilities)
-
-        result = {
-            "prediction": class_map[max_prob_idx],
-            "confidence": float(probabilities[max_prob_idx]),
-            "probabilities": {
-                class_map[0]: float(probabilities[0]),
-                class_map[1]: float(probabilities[1]),
-                class_map[2]: float(probabilities[2])
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0, 1)
+
+
+def process_stats():
+    return {"peak_rss_mb": peak_rss_mb(), "torch_threads": torch.get_num_threads()}
+
+
+class LatencyHistogram:
+    BUCKET_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, window=2048):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, ms):
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = collections.deque(maxlen=self.window)
+            self._samples[stage].append(ms)
+
+    def summary(self):
+        with self._lock:
+            samples = {stage: np.array(values) for stage, values in self._samples.items()}
+        summary = {}
+        for stage, values in samples.items():
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            counts = np.bincount(np.searchsorted(self.BUCKET_EDGES_MS, values),
+                                 minlength=len(self.BUCKET_EDGES_MS) + 1)
+            labels = [f"<={edge}" for edge in self.BUCKET_EDGES_MS] + [f">{self.BUCKET_EDGES_MS[-1]}"]
+            summary[stage] = {
+                "count": int(len(values)),
+                "p50": round(float(p50), 3),
+                "p90": round(float(p90), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(values.max()), 3),
+                "buckets_ms": {label: int(count) for label, count in zip(labels, counts) if count},
             }
+        return summary
+
+
+# Feature Cache
+# Content-addressed cache of normalised spectrograms. Keys hash the raw audio
+# bytes (file contents or waveform buffer) together with every preprocessing
+# parameter, so a clip that is uploaded again is never decoded again. The
+# memory tier is an LRU bounded by max_bytes; the optional disk tier keeps one
+# .npy file per key and serves hits as read-only memory maps.
+#   FEATURE_CACHE_MAX_MB  memory tier size, 0 disables the cache (default 64)
+#   FEATURE_CACHE_DIR     directory for the disk tier (disabled when unset)
+class FeatureCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(source, params):
+        digest = hashlib.sha256()
+        if isinstance(source, np.ndarray):
+            digest.update(b"array:" + str(source.dtype).encode())
+            digest.update(np.ascontiguousarray(source).tobytes())
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            digest.update(source)
+        else:
+            # Only the first `duration` seconds of a file are decoded, so files
+            # are identified by path, size and mtime rather than hashed whole
+            try:
+                stat = os.stat(source)
+            except OSError:
+                return None
+            digest.update(f"file:{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def get(self, key, count=True):
+        # Secondary lookups for a clip pass count=False so hits and misses stay
+        # one per clip; the caller records the outcome with count_lookup()
+        if key is None:
+            return None
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is not None:
+                self._entries.move_to_end(key)
+                if count:
+                    self.stats["hits"] += 1
+                return spec
+
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                spec = np.load(self._disk_path(key), mmap_mode="r")
+            except (OSError, ValueError):
+                spec = None
+            if spec is not None:
+                if count:
+                    with self._lock:
+                        self.stats["disk_hits"] += 1
+                self._remember(key, spec)
+                return spec
+
+        if count:
+            with self._lock:
+                self.stats["misses"] += 1
+        return None
+
+    def count_lookup(self, hit):
+        with self._lock:
+            self.stats["hits" if hit else "misses"] += 1
+
+    def put(self, key, spec):
+        if key is None:
+            return
+        self._remember(key, spec)
+        if self.cache_dir and not os.path.exists(self._disk_path(key)):
+            # Write then rename so readers never map a half-written file
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    np.save(f, spec)
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+
+    def _remember(self, key, spec):
+        if spec.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = spec
+            self._bytes += spec.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.stats["evictions"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        stats["max_bytes"] = self.max_bytes
+        stats["cache_dir"] = self.cache_dir
+        return stats
+
+
+def _feature_cache_from_env():
+    max_mb = float(os.getenv("FEATURE_CACHE_MAX_MB", "64"))
+    if max_mb <= 0:
+        return None
+    return FeatureCache(max_bytes=int(max_mb * 1024 * 1024), cache_dir=os.getenv("FEATURE_CACHE_DIR") or None)
+
+
+FEATURE_CACHE = _feature_cache_from_env()
+
+
+# Signal Prefilter
+# Optional cheap stage that runs on the decoded waveform before the mel front
+# end. Clips that are near-silent, or steady-state (low spectral flux and no
+# onset peak), are answered as "traffic" with "prefiltered": true and skip the
+# mel front end and the CRNN. All features come from one 512-point STFT:
+#   rms_db      overall level in dBFS
+#   flux        mean positive frame-to-frame change of the normalised magnitude spectrum
+#   onset_peak  peak of the onset envelope (mean positive log-power rise per frame)
+#               relative to its median, so a single crash transient stands out
+# Thresholds come from calibrate_prefilter() on the labelled dataset folders and
+# are loaded from the JSON file named by PREDICT_PREFILTER (disabled when unset).
+class Prefiltered:
+    def __init__(self, reason, features):
+        self.reason = reason
+        self.features = features
+
+
+def prefilter_features(waveform, n_fft=512, hop_length=256):
+    waveform = np.asarray(waveform, dtype=np.float32)
+    rms_db = 10.0 * np.log10(float(np.mean(waveform.astype(np.float64) ** 2)) + 1e-12)
+    if len(waveform) < n_fft + hop_length:
+        return {"rms_db": round(rms_db, 3), "flux": 0.0, "onset_peak": 0.0}
+
+    n_frames = 1 + (len(waveform) - n_fft) // hop_length
+    frames = np.lib.stride_tricks.as_strided(
+        waveform, shape=(n_frames, n_fft),
+        strides=(hop_length * waveform.strides[0], waveform.strides[0]), writeable=False)
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(n_fft).astype(np.float32), axis=-1))
+
+    normalised = magnitude / (magnitude.sum(axis=1, keepdims=True) + 1e-10)
+    flux = float(np.maximum(np.diff(normalised, axis=0), 0.0).sum(axis=1).mean())
+    log_power = 10.0 * np.log10(magnitude ** 2 + 1e-10)
+    onset = np.maximum(np.diff(log_power, axis=0), 0.0).mean(axis=1)
+    onset_peak = float(onset.max() / (np.median(onset) + 1e-6))
+    return {"rms_db": round(rms_db, 3), "flux": round(flux, 5), "onset_peak": round(onset_peak, 4)}
+
+
+def prefilter_decision(features, thresholds):
+    if features["rms_db"] < thresholds.get("silence_db", float("-inf")):
+        return "silence"
+    flux_max = thresholds.get("flux_max")
+    onset_max = thresholds.get("onset_peak_max")
+    if flux_max is not None and onset_max is not None:
+        if features["flux"] < flux_max and features["onset_peak"] < onset_max:
+            return "steady_state"
+    return None
+
+
+def load_prefilter(path):
+    with open(path) as f:
+        return json.load(f)["thresholds"]
+
+
+PREFILTER = load_prefilter(os.environ["PREDICT_PREFILTER"]) if os.getenv("PREDICT_PREFILTER") else None
+
+
+def prefiltered_result(prefiltered):
+    result = format_prediction(np.eye(len(CLASS_MAP))[1])
+    result["prefiltered"] = True
+    result["prefilter"] = dict(prefiltered.features, reason=prefiltered.reason)
+    return result
+
+
+# Feature Extraction
+# Returns one normalised spectrogram per source (None where decoding failed,
+# a Prefiltered marker where the prefilter answered for the clip). Cache hits
+# skip decoding; the misses are decoded and then run through the mel front
+# end together. Prefilter features are cached next to the spectrogram, under
+# the same key plus PREFILTER_KEY_SUFFIX, so a clip gets the same decision
+# whether or not it is cached, and prefiltered clips are not decoded again.
+PREFILTER_FEATURES = ("rms_db", "flux", "onset_peak")
+PREFILTER_KEY_SUFFIX = "_prefilter"
+
+
+def extract_features(sources, cache=None, sr=16000, n_mels=128, n_fft=2048, hop_length=512, fixed_length=128,
+                     timer=NULL_TIMER, prefilter=None):
+    params = {"sr": sr, "n_mels": n_mels, "n_fft": n_fft, "hop_length": hop_length,
+              "fixed_length": fixed_length, "duration": 2.0, "backend": MEL_BACKEND}
+    specs = [None] * len(sources)
+    pending = []
+    for i, source in enumerate(sources):
+        features = None
+        with timer.stage("cache_lookup"):
+            key = cache.key_for(source, params) if cache is not None else None
+            if prefilter is not None and key is not None:
+                cached = cache.get(key + PREFILTER_KEY_SUFFIX, count=False)
+                if cached is not None:
+                    features = dict(zip(PREFILTER_FEATURES, cached.tolist()))
+
+        waveform = None
+        if prefilter is not None:
+            features_cached = features is not None
+            if features is None:
+                with timer.stage("decode"):
+                    waveform = load_audio(source, sr=sr)
+                if waveform is None:
+                    continue
+                with timer.stage("prefilter"):
+                    features = prefilter_features(waveform)
+                if key is not None:
+                    cached = np.array([features[name] for name in PREFILTER_FEATURES])
+                    cache.put(key + PREFILTER_KEY_SUFFIX, cached)
+            reason = prefilter_decision(features, prefilter)
+            if reason is not None:
+                # A skipped clip never has a spectrogram; its features are its cache entry
+                if key is not None:
+                    cache.count_lookup(features_cached)
+                specs[i] = Prefiltered(reason, features)
+                continue
+        with timer.stage("cache_lookup"):
+            spec = cache.get(key) if key is not None else None
+        if spec is not None:
+            specs[i] = spec
+            continue
+        if waveform is None:
+            with timer.stage("decode"):
+                waveform = load_audio(source, sr=sr)
+            if waveform is None:
+                continue
+        pending.append((i, key, waveform))
+
+    with timer.stage("mel"):
+        computed = melspec_batch([waveform for _, _, waveform in pending], sr=sr, n_mels=n_mels,
+                                 n_fft=n_fft, hop_length=hop_length, fixed_length=fixed_length)
+    for (i, key, _), spec in zip(pending, computed):
+        specs[i] = spec
+        if cache is not None:
+            cache.put(key, spec)
+    return specs
+
+
+# Pre-processing Function
+def audio_to_melspec(audio, sr=16000, n_mels=128, n_fft=2048, hop_length=512, fixed_length=128):
+    return extract_features([audio], cache=FEATURE_CACHE, sr=sr, n_mels=n_mels, n_fft=n_fft,
+                            hop_length=hop_length, fixed_length=fixed_length)[0]
+
+
+def check_mel_parity(waveform, **kwargs):
+    # Largest absolute difference between the NumPy and librosa front ends
+    waveform = np.asarray(waveform, dtype=np.float32)
+    ours = melspec_batch([waveform], backend="numpy", **kwargs)[0]
+    reference = melspec_batch([waveform], backend="librosa", **kwargs)[0]
+    return float(np.max(np.abs(ours - reference)))
+
+
+CLASS_MAP = {0: 'glass_break', 1: 'traffic', 2: 'car_crash'}
+
+
+# Model Loading
+# `.pth` files hold an AudioCRNN state dict. `.pt` files are TorchScript
+# artifacts written by optimize_model.py (BatchNorm folded into the convolutions,
+# int8 dynamic quantization of the GRU and fully connected layers).
+TORCHSCRIPT_EXTENSIONS = ('.pt', '.ts')
+
+
+def load_model(model_path):
+    if model_path.endswith(TORCHSCRIPT_EXTENSIONS):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(model_path)
+        model = torch.jit.load(model_path, map_location=torch.device('cpu'))
+        model.eval()
+        return model
+
+    model = AudioCRNN(num_classes=3)
+    model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
+    model.eval()
+    return model
+
+
+def format_prediction(probabilities):
+    max_prob_idx = int(np.argmax(probabilities))
+    return {
+        "prediction": CLASS_MAP[max_prob_idx],
+        "confidence": float(probabilities[max_prob_idx]),
+        "probabilities": {
+            CLASS_MAP[0]: float(probabilities[0]),
+            CLASS_MAP[1]: float(probabilities[1]),
+            CLASS_MAP[2]: float(probabilities[2])
         }
-        return result
+    }
+
+
+def describe_source(source):
+    if isinstance(source, np.ndarray):
+        return f"<array shape={source.shape}>"
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<{len(source)} bytes>"
+    return str(source)
+
+
+# Prediction Function
+def predict(model_path, audio_path, model=None, timings=False, prefilter=None):
+    return predict_batch(model_path, [audio_path], model=model, timings=timings, prefilter=prefilter)[0]
+
+
+# Batched Prediction
+# Runs every decodable clip through a single (N, 1, 128, 128) forward pass.
+# Results are returned in input order; clips that fail to decode get an error
+# entry of their own without affecting the rest of the batch. With
+# timings=True every result carries a "timings" block for the whole batch.
+# `prefilter` is a thresholds dict; it defaults to the PREDICT_PREFILTER file.
+def predict_batch(model_path, sources, model=None, timings=False, prefilter=None):
+    sources = list(sources)
+    timer = StageTimer() if timings else NULL_TIMER
+    if model is None:
+        try:
+            with timer.stage("model_load"):
+                model = load_model(model_path)
+        except FileNotFoundError:
+            return [{"error": f"Model file not found at {model_path}"} for _ in sources]
+        if timings:
+            # Cold call: the interpreter paid for importing torch as well
+            timer.stages["torch_import"] = TORCH_IMPORT_MS
+            timer.stages.move_to_end("torch_import", last=False)
+
+    features = extract_features(sources, cache=FEATURE_CACHE, timer=timer,
+                                prefilter=prefilter if prefilter is not None else PREFILTER)
+    results = classify_features(model, features, sources, timer=timer)
+    if timings:
+        report = timer.report(batch_size=len(sources))
+        for result in results:
+            result["timings"] = dict(report)
+    return results
+
+
+# Runs precomputed spectrograms (None where decoding failed) through the model
+def classify_features(model, features, sources, timer=NULL_TIMER):
+    results = [None] * len(sources)
+    specs = []
+    indices = []
+    for i, spec in enumerate(features):
+        if spec is None:
+            results[i] = {"error": f"Failed to process audio file at {describe_source(sources[i])}"}
+        elif isinstance(spec, Prefiltered):
+            results[i] = prefiltered_result(spec)
+        else:
+            specs.append(spec)
+            indices.append(i)
+
+    if not specs:
+        return results
+
+    try:
+        with timer.stage("forward"):
+            spec_tensor = torch.from_numpy(np.stack(specs).astype(np.float32)).unsqueeze(1)
+            with torch.no_grad():
+                output = model(spec_tensor)
+            probabilities = torch.softmax(output, dim=1).numpy()
+        for i, probs in zip(indices, probabilities):
+            results[i] = format_prediction(probs)
     except Exception as e:
-        return {"error": f"An error occurred during model inference: {str(e)}"}
+        for i in indices:
+            results[i] = {"error": f"An error occurred during model inference: {str(e)}"}
+    return results
+
+
+# Streaming Classification
+# Long recordings are read block by block and classified as overlapping
+# windows of window_seconds every hop_seconds, so only about one window of
+# audio is held in memory regardless of file length. Each window is
+# preprocessed exactly like a standalone clip (centered STFT, per-window
+# power_to_db and min-max scaling). The window hop is rounded to a whole
+# number of STFT hops (hop_length samples, so 1.0 s becomes 0.992 s at 16 kHz);
+# STFT frames that lie fully inside two overlapping windows are then
+# identical, so their mel power is computed once and reused; only the frames
+# touching a window's zero-padded edges are recomputed. The GRU state is not
+# carried across windows: the model always starts from a zero state on a
+# per-window normalised spectrogram, so reusing it would change predictions.
+def stream_audio(audio_path, sr=16000, block_seconds=1.0):
+    try:
+        import soundfile
+        info = soundfile.info(audio_path)
+    except Exception:
+        # Formats libsndfile cannot read fall back to a full decode
+        audio, _ = _librosa().load(audio_path, sr=sr)
+        block = int(sr * block_seconds)
+        for start in range(0, len(audio), block):
+            yield audio[start:start + block]
+        return
+
+    native_sr = info.samplerate
+    block_frames = max(1, int(native_sr * block_seconds))
+    for block in soundfile.blocks(audio_path, blocksize=block_frames, dtype='float32', always_2d=True):
+        mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        if native_sr != sr:
+            # Blocks are resampled independently; boundary effects are far
+            # below the per-window min-max scaling
+            mono = _librosa().resample(mono, orig_sr=native_sr, target_sr=sr)
+        yield np.ascontiguousarray(mono, dtype=np.float32)
+
+
+def sliding_windows(chunks, window_samples, hop_samples):
+    # Yields (start_sample, window). If the recording does not end on a window
+    # boundary, one last full-length window aligned to the end is emitted; a
+    # recording shorter than one window is emitted as a single short window.
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0
+    next_start = 0
+    emitted_end = 0
+    for chunk in chunks:
+        buffer = np.concatenate([buffer, chunk])
+        total = buffer_start + len(buffer)
+        while next_start + window_samples <= total:
+            offset = next_start - buffer_start
+            yield next_start, buffer[offset:offset + window_samples]
+            emitted_end = next_start + window_samples
+            next_start += hop_samples
+        # Keep only what the next window or the final end-aligned window can need
+        drop = min(next_start, total - window_samples) - buffer_start
+        if drop > 0:
+            buffer = buffer[drop:]
+            buffer_start += drop
+
+    total = buffer_start + len(buffer)
+    if emitted_end == 0:
+        if total > 0:
+            yield 0, buffer
+    elif total > emitted_end:
+        start = total - window_samples
+        yield start, buffer[start - buffer_start:]
+
+
+class StreamingMelFrontEnd:
+    def __init__(self, frontend, window_samples, hop_samples, fixed_length=128):
+        self.frontend = frontend
+        self.window_samples = window_samples
+        self.fixed_length = fixed_length
+        self.reuse = hop_samples % frontend.hop_length == 0
+        self.stats = {"frames_computed": 0, "frames_reused": 0}
+        self._frames = {}
+
+    def __call__(self, start, window):
+        frontend = self.frontend
+        hop = frontend.hop_length
+        half = frontend.n_fft // 2
+        if len(window) != self.window_samples or not self.reuse:
+            self.stats["frames_computed"] += frontend.num_frames(len(window))
+            return normalize_melspec(frontend.melspec_db([window])[0], self.fixed_length)
+
+        n_frames = frontend.num_frames(len(window))
+        centers = np.arange(n_frames) * hop
+        interior = (centers >= half) & (centers + half <= len(window))
+        mel = np.empty((n_frames, frontend.n_mels), dtype=np.float32)
+
+        missing = []
+        for t in range(n_frames):
+            cached = self._frames.get(start + centers[t]) if interior[t] else None
+            if cached is None:
+                missing.append(t)
+            else:
+                mel[t] = cached
+        self.stats["frames_reused"] += n_frames - len(missing)
+        self.stats["frames_computed"] += len(missing)
+
+        if missing:
+            padded = np.pad(window, (half, half), mode='constant')
+            frames = np.stack([padded[t * hop:t * hop + frontend.n_fft] for t in missing])
+            mel[missing] = frontend.frames_to_mel(frames)
+            for t in missing:
+                if interior[t]:
+                    self._frames[start + centers[t]] = mel[t]
+
+        # Frames before this window can never be shared with a later one
+        for key in [key for key in self._frames if key < start]:
+            del self._frames[key]
+        return normalize_melspec(frontend.power_to_db(mel.T), self.fixed_length)
+
+
+def predict_stream(model_path, audio_path, window_seconds=2.0, hop_seconds=1.0, batch_size=16,
+                   model=None, sr=16000):
+    # Generator of per-window predictions with start/end times in seconds
+    if model is None:
+        model = load_model(model_path)
+    window_samples = int(sr * window_seconds)
+    frontend = get_mel_frontend(sr=sr)
+    hop_samples = max(1, round(sr * hop_seconds / frontend.hop_length)) * frontend.hop_length
+    if MEL_BACKEND == "librosa":
+        features = lambda start, window: melspec_batch([window], sr=sr, backend="librosa")[0]
+    else:
+        features = StreamingMelFrontEnd(frontend, window_samples, hop_samples)
+
+    def classify(pending):
+        spec_tensor = torch.from_numpy(np.stack([spec for _, _, spec in pending]).astype(np.float32)).unsqueeze(1)
+        with torch.no_grad():
+            probabilities = torch.softmax(model(spec_tensor), dim=1).numpy()
+        for (start, length, _), probs in zip(pending, probabilities):
+            result = {"start": round(start / sr, 3), "end": round((start + length) / sr, 3)}
+            result.update(format_prediction(probs))
+            yield result
+
+    pending = []
+    for start, window in sliding_windows(stream_audio(audio_path, sr=sr), window_samples, hop_samples):
+        pending.append((start, len(window), features(start, window)))
+        if len(pending) >= batch_size:
+            yield from classify(pending)
+            pending = []
+    if pending:
+        yield from classify(pending)
+
+
+# Dataset Classification
+# Re-scores a whole dataset directory or manifest. Worker processes decode
+# clips and compute mel features a batch at a time while the parent runs the
+# single model instance, with a bounded number of batches in flight. Results
+# are appended to a JSONL file after every batch; rerunning with the same
+# output skips every path already recorded there. Clips under the labelled
+# dataset folders are compared with their folder label in the final summary.
+DATASET_FOLDER_LABELS = {
+    'car_crash_dataset': 'car_crash',
+    'glass_breaking_dataset': 'glass_break',
+    'road_traffic_dataset': 'traffic',
+}
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.flac', '.ogg')
+
+
+def folder_label(audio_path):
+    for part in os.path.normpath(audio_path).split(os.sep):
+        if part in DATASET_FOLDER_LABELS:
+            return DATASET_FOLDER_LABELS[part]
+    return None
+
+
+def list_dataset_dir(dataset_dir):
+    paths = []
+    for root, dirs, files in os.walk(dataset_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return paths
+
+
+def read_manifest(manifest_path):
+    # One audio path per line, relative paths resolved against the manifest's folder
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                paths.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return paths
+
+
+def read_completed(output_path):
+    # Paths already classified; a torn last line from an interrupted run is dropped
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    for line in data.decode('utf-8').splitlines():
+        try:
+            completed.add(json.loads(line)["path"])
+        except (ValueError, KeyError):
+            continue
+    return completed
+
+
+# Set by the pool initializer: spawned workers (the macOS and Windows default)
+# do not inherit a prefilter loaded after import
+_worker_prefilter = None
+
+
+def _init_dataset_worker(prefilter):
+    global _worker_prefilter
+    _worker_prefilter = prefilter
+
+
+def _extract_features_worker(paths):
+    return extract_features(paths, prefilter=_worker_prefilter)
+
+
+# `prefilter` is a thresholds dict; it defaults to the PREDICT_PREFILTER file.
+def classify_dataset(model_path, paths, output_path, workers=None, batch_size=32, model=None, prefilter=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    prefilter = prefilter if prefilter is not None else PREFILTER
+    model = model if model is not None else load_model(model_path)
+    completed = read_completed(output_path)
+    remaining = [path for path in paths if path not in completed]
+    batches = [remaining[i:i + batch_size] for i in range(0, len(remaining), batch_size)]
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+
+    with open(output_path, 'a') as output, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_dataset_worker, initargs=(prefilter,)) as pool:
+        in_flight = collections.deque()
+        next_batch = 0
+        while next_batch < len(batches) or in_flight:
+            while next_batch < len(batches) and len(in_flight) < max_in_flight:
+                batch = batches[next_batch]
+                in_flight.append((batch, pool.submit(_extract_features_worker, batch)))
+                next_batch += 1
+
+            batch, future = in_flight.popleft()
+            try:
+                features = future.result()
+            except Exception:
+                features = [None] * len(batch)
+            for path, result in zip(batch, classify_features(model, features, batch)):
+                record = {"path": path, "label": folder_label(path)}
+                record.update(result)
+                output.write(json.dumps(record) + "\n")
+            output.flush()
+
+    return summarize_results(output_path, skipped=len(paths) - len(remaining))
+
+
+def summarize_results(output_path, skipped=0):
+    classes = [CLASS_MAP[i] for i in sorted(CLASS_MAP)]
+    confusion = {label: {predicted: 0 for predicted in classes} for label in classes}
+    total = errors = unlabelled = 0
+    with open(output_path) as f:
+        for line in f:
+            record = json.loads(line)
+            total += 1
+            if "error" in record:
+                errors += 1
+            elif record.get("label") in confusion:
+                confusion[record["label"]][record["prediction"]] += 1
+            else:
+                unlabelled += 1
+
+    per_class = {}
+    for label in classes:
+        support = sum(confusion[label].values())
+        predicted = sum(confusion[other][label] for other in classes)
+        correct = confusion[label][label]
+        per_class[label] = {
+            "support": support,
+            "recall": round(correct / support, 4) if support else None,
+            "precision": round(correct / predicted, 4) if predicted else None,
+        }
+    labelled = sum(per_class[label]["support"] for label in classes)
+    correct = sum(confusion[label][label] for label in classes)
+    return {
+        "output_path": output_path,
+        "total": total,
+        "resumed": skipped,
+        "errors": errors,
+        "unlabelled": unlabelled,
+        "accuracy": round(correct / labelled, 4) if labelled else None,
+        "per_class": per_class,
+        "confusion": confusion,
+    }
+
+
+# Prefilter Calibration
+# Computes prefilter features for every labelled clip and grid-searches the
+# silence, flux and onset thresholds (candidates are quantiles of the traffic
+# clips) for the setting that skips the most traffic clips while prefiltering
+# at most max_recall_loss of the car_crash clips and of the glass_break clips.
+# Because prefiltered clips are always answered "traffic", that fraction is
+# an upper bound on the recall lost for each of those classes.
+def calibrate_prefilter(paths, max_recall_loss=0.01, workers=None):
+    from concurrent.futures import ProcessPoolExecutor
+
+    labelled = [(path, folder_label(path)) for path in paths if folder_label(path) is not None]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        features = list(pool.map(_prefilter_features_worker, [path for path, _ in labelled], chunksize=16))
+    rows = [(label, f) for (_, label), f in zip(labelled, features) if f is not None]
+    if not rows:
+        raise ValueError("No labelled clips could be decoded for calibration")
+
+    labels = np.array([label for label, _ in rows])
+    rms_db = np.array([f["rms_db"] for _, f in rows])
+    flux = np.array([f["flux"] for _, f in rows])
+    onset = np.array([f["onset_peak"] for _, f in rows])
+    traffic = labels == "traffic"
+    protected = {label: labels == label for label in ("car_crash", "glass_break")}
+    if not np.any(traffic):
+        raise ValueError("Calibration needs clips under road_traffic_dataset")
+    # The recall loss of a class without clips would be reported as 0 without being measured
+    missing = [label for label, mask in protected.items() if not np.any(mask)]
+    if missing:
+        raise ValueError(f"Calibration needs car_crash and glass_break clips, none decoded for: {', '.join(missing)}")
+
+    quantiles = np.linspace(0.0, 1.0, 21)
+    silence_candidates = np.concatenate([[-np.inf], np.quantile(rms_db[traffic], quantiles) + 1e-6])
+    flux_candidates = np.concatenate([[-np.inf], np.quantile(flux[traffic], quantiles) + 1e-9])
+    onset_candidates = np.concatenate([[-np.inf], np.quantile(onset[traffic], quantiles) + 1e-9])
+
+    best = None
+    steady_by_pair = {}
+    for flux_max in flux_candidates:
+        for onset_max in onset_candidates:
+            steady_by_pair[(flux_max, onset_max)] = (flux < flux_max) & (onset < onset_max)
+    for silence_db in silence_candidates:
+        silent = rms_db < silence_db
+        for (flux_max, onset_max), steady in steady_by_pair.items():
+            skipped = silent | steady
+            losses = {label: float(skipped[mask].mean()) for label, mask in protected.items()}
+            if any(loss > max_recall_loss for loss in losses.values()):
+                continue
+            skip_rate = float(skipped[traffic].mean())
+            if best is None or skip_rate > best[0]:
+                best = (skip_rate, silence_db, flux_max, onset_max, losses, float(skipped.mean()))
+
+    skip_rate, silence_db, flux_max, onset_max, losses, overall = best
+    # Thresholds are stored unrounded so they reproduce the calibrated decisions exactly
+    thresholds = {}
+    if np.isfinite(silence_db):
+        thresholds["silence_db"] = float(silence_db)
+    if np.isfinite(flux_max) and np.isfinite(onset_max):
+        thresholds["flux_max"] = float(flux_max)
+        thresholds["onset_peak_max"] = float(onset_max)
+    return {
+        "thresholds": thresholds,
+        "calibration": {
+            "clips": int(len(rows)),
+            "per_label": {label: int(np.sum(labels == label)) for label in sorted(set(labels))},
+            "max_recall_loss": max_recall_loss,
+            "recall_loss": {label: round(loss, 4) for label, loss in losses.items()},
+            "traffic_skip_rate": round(skip_rate, 4),
+            "overall_skip_rate": round(overall, 4),
+        },
+    }
+
+
+def _prefilter_features_worker(path):
+    waveform = load_audio(path)
+    return prefilter_features(waveform) if waveform is not None else None
+
+
+# Micro-batching Scheduler
+# Callers submit single clips and get a concurrent.futures.Future back. A worker
+# thread flushes the queue as one predict_batch call as soon as either
+# max_batch_size clips are waiting or the oldest waiting clip has been queued
+# for max_wait_ms. submit() raises SchedulerOverloaded once max_queue_depth
+# clips are waiting.
+class SchedulerOverloaded(RuntimeError):
+    pass
+
+
+class MicroBatchScheduler:
+    def __init__(self, model_path, model=None, max_batch_size=16, max_wait_ms=5.0, max_queue_depth=256,
+                 prefilter=None):
+        self.model_path = model_path
+        self.model = model if model is not None else load_model(model_path)
+        self.prefilter = prefilter
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.stats = {"submitted": 0, "rejected": 0, "batches": 0, "batched_clips": 0, "prefiltered": 0}
+        self.latency = LatencyHistogram()
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="MicroBatchScheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, source, timings=False):
+        # With timings=True the result keeps its "timings" block, including queue_wait_ms
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Scheduler is closed")
+            if len(self._queue) >= self.max_queue_depth:
+                self.stats["rejected"] += 1
+                raise SchedulerOverloaded(f"Inference queue is full ({self.max_queue_depth} clips waiting)")
+            self._queue.append((time.monotonic(), source, future, timings))
+            self.stats["submitted"] += 1
+            self._cond.notify()
+        return future
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._queue)
+
+    def snapshot(self):
+        with self._cond:
+            stats = dict(self.stats)
+            stats["queue_depth"] = len(self._queue)
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait * 1000.0
+        stats["max_queue_depth"] = self.max_queue_depth
+        stats["mean_batch_size"] = round(stats["batched_clips"] / stats["batches"], 3) if stats["batches"] else 0.0
+        return stats
+
+    def close(self):
+        # Clips already queued are still classified before the worker exits
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._worker.join()
+
+    def _next_batch(self):
+        with self._cond:
+            while self._running and not self._queue:
+                self._cond.wait()
+            if not self._queue:
+                return None
+
+            deadline = self._queue[0][0] + self.max_wait
+            while self._running and len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            size = min(len(self._queue), self.max_batch_size)
+            batch = [self._queue.popleft() for _ in range(size)]
+            self.stats["batches"] += 1
+            self.stats["batched_clips"] += size
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            started = time.monotonic()
+            live = [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                results = predict_batch(self.model_path, [entry[1] for entry in live], model=self.model,
+                                        timings=True, prefilter=self.prefilter)
+            except Exception as e:
+                for entry in live:
+                    entry[2].set_exception(e)
+                continue
+
+            for stage, ms in results[0]["timings"]["stages_ms"].items():
+                self.latency.record(stage, ms)
+            finished = time.monotonic()
+            with self._cond:
+                self.stats["prefiltered"] += sum(1 for result in results if result.get("prefiltered"))
+            for (queued_at, _, future, timings), result in zip(live, results):
+                queue_wait_ms = (started - queued_at) * 1000.0
+                self.latency.record("queue_wait", queue_wait_ms)
+                self.latency.record("request", (finished - queued_at) * 1000.0)
+                if timings:
+                    result["timings"]["queue_wait_ms"] = round(queue_wait_ms, 3)
+                else:
+                    del result["timings"]
+                future.set_result(result)
+
+
+# Daemon Mode
+# Newline-delimited JSON over stdin/stdout. The model is loaded once and every
+# request line gets exactly one response line, echoing the request "id".
+# Responses to "predict" can arrive out of order, since concurrent predict
+# requests are grouped into batches by a MicroBatchScheduler.
+#   {"id": 1, "cmd": "predict", "audio_path": "/tmp/clip.wav", "timings": true}
+#   {"id": 1, "cmd": "predict", "audio_bytes": 64044}   followed by 64044 raw bytes
+#   {"id": 2, "cmd": "predict_batch", "audio_paths": ["/tmp/a.wav", "/tmp/b.wav"]}
+#   {"id": 3, "cmd": "predict_stream", "audio_path": "/tmp/long.wav", "hop_seconds": 1.0}
+#   {"id": 4, "cmd": "health"}
+#   {"id": 5, "cmd": "reload"}
+#   {"id": 6, "cmd": "shutdown"}
+def serve(model_path, stdin=None, stdout=None, max_batch_size=16, max_wait_ms=5.0, max_queue_depth=256,
+          prefilter=None):
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout
+    prefilter = prefilter if prefilter is not None else PREFILTER
+    output_lock = threading.Lock()
+
+    def send(message):
+        line = json.dumps(message) + "\n"
+        with output_lock:
+            stdout.write(line)
+            stdout.flush()
+
+    try:
+        model = load_model(model_path)
+    except FileNotFoundError:
+        send({"event": "error", "error": f"Model file not found at {model_path}"})
+        return 1
+
+    scheduler = MicroBatchScheduler(model_path, model=model, max_batch_size=max_batch_size,
+                                    max_wait_ms=max_wait_ms, max_queue_depth=max_queue_depth,
+                                    prefilter=prefilter)
+    started_at = time.time()
+    stats = {"requests": 0, "errors": 0}
+    stats_lock = threading.Lock()
+
+    def count(requests=0, errors=0):
+        with stats_lock:
+            stats["requests"] += requests
+            stats["errors"] += errors
+
+    # Streams and batches can take much longer than a single clip, so they get
+    # their own workers instead of blocking the stdin reader (and health probes)
+    stream_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="predict_stream")
+    batch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="predict_batch")
+
+    def stream_timeline(request):
+        return list(predict_stream(model_path, request.get("audio_path"), model=scheduler.model,
+                                   window_seconds=float(request.get("window_seconds", 2.0)),
+                                   hop_seconds=float(request.get("hop_seconds", 1.0))))
+
+    def run_batch(audio_paths, timings):
+        results = predict_batch(model_path, audio_paths, model=scheduler.model, timings=timings,
+                                prefilter=prefilter)
+        count(errors=sum(1 for result in results if "error" in result))
+        return results
+
+    def reply_job(request_id, failure):
+        def on_done(future):
+            try:
+                send({"id": request_id, "result": future.result()})
+            except Exception as e:
+                count(errors=1)
+                send({"id": request_id, "error": f"{failure}: {str(e)}"})
+        return on_done
+
+    def reply(request_id):
+        def on_done(future):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"error": f"An error occurred during model inference: {str(e)}"}
+            count(errors=1 if "error" in result else 0)
+            send({"id": request_id, "result": result})
+        return on_done
+
+    send({"event": "ready", "pid": os.getpid(), "prefilter": prefilter})
+
+    while True:
+        line = stdin.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            count(errors=1)
+            send({"id": None, "error": "Invalid JSON request"})
+            continue
+        if not isinstance(request, dict):
+            count(errors=1)
+            send({"id": None, "error": "Request must be a JSON object"})
+            continue
+
+        request_id = request.get("id")
+        cmd = request.get("cmd", "predict")
+
+        if cmd == "predict":
+            count(requests=1)
+            if "audio_bytes" in request:
+                # The encoded clip follows the request line as exactly audio_bytes raw bytes
+                size = request["audio_bytes"]
+                if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+                    count(errors=1)
+                    send({"id": request_id, "error": "audio_bytes must be a non-negative integer"})
+                    continue
+                source = stdin.read(size)
+                if len(source) < size:
+                    count(errors=1)
+                    send({"id": request_id, "error": "Audio payload truncated"})
+                    break
+            else:
+                source = request.get("audio_path")
+                if not source or not os.path.exists(source):
+                    count(errors=1)
+                    send({"id": request_id, "result": {"error": f"Audio file not found: {source}"}})
+                    continue
+            try:
+                future = scheduler.submit(source, timings=bool(request.get("timings")))
+            except SchedulerOverloaded as e:
+                count(errors=1)
+                send({"id": request_id, "error": str(e)})
+                continue
+            future.add_done_callback(reply(request_id))
+        elif cmd == "predict_batch":
+            audio_paths = request.get("audio_paths") or []
+            if not isinstance(audio_paths, list) or not all(isinstance(path, str) for path in audio_paths):
+                count(errors=1)
+                send({"id": request_id, "error": "audio_paths must be a list of file paths"})
+                continue
+            count(requests=len(audio_paths))
+            future = batch_pool.submit(run_batch, audio_paths, bool(request.get("timings")))
+            future.add_done_callback(reply_job(request_id, "An error occurred during batch inference"))
+        elif cmd == "predict_stream":
+            count(requests=1)
+            future = stream_pool.submit(stream_timeline, request)
+            audio_path = request.get("audio_path")
+            future.add_done_callback(reply_job(request_id, f"Failed to stream audio file at {audio_path}"))
+        elif cmd == "health":
+            with stats_lock:
+                requests, errors = stats["requests"], stats["errors"]
+            send({"id": request_id, "result": {
+                "status": "healthy",
+                "pid": os.getpid(),
+                "model_path": model_path,
+                "uptime": round(time.time() - started_at, 3),
+                "requests": requests,
+                "errors": errors,
+                "scheduler": scheduler.snapshot(),
+                "latency_ms": scheduler.latency.summary(),
+                "process": process_stats(),
+                "feature_cache": FEATURE_CACHE.snapshot() if FEATURE_CACHE is not None else None,
+                "prefilter": prefilter,
+            }})
+        elif cmd == "reload":
+            try:
+                scheduler.model = load_model(model_path)
+                send({"id": request_id, "result": {"status": "reloaded"}})
+            except Exception as e:
+                send({"id": request_id, "error": f"Failed to reload model: {str(e)}"})
+        elif cmd == "shutdown":
+            scheduler.close()
+            stream_pool.shutdown()
+            batch_pool.shutdown()
+            send({"id": request_id, "result": {"status": "shutting_down"}})
+            return 0
+        else:
+            send({"id": request_id, "error": f"Unknown command: {cmd}"})
+
+    scheduler.close()
+    stream_pool.shutdown()
+    batch_pool.shutdown()
+    return 0
 
 
 #  Main Execution Block
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Predict audio event from an audio file.")
-    parser.add_argument("model_path", type=str, help="Path to the trained .pth model file.")
-    parser.add_argument("audio_path", type=str, help="Path to the audio file to be classified.")
+    parser.add_argument("model_path", type=str,
+                        help="Path to the trained .pth model file or an optimized .pt TorchScript artifact.")
+    parser.add_argument("audio_paths", type=str, nargs="*",
+                        help="Path(s) to the audio file(s) to be classified, or - to read one clip from stdin. "
+                             "Several paths are classified in one batch and printed as a JSON list.")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a long-lived daemon reading JSON requests from stdin.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Classify the whole recording as overlapping windows, printing one JSON line per window.")
+    parser.add_argument("--window-seconds", type=float, default=2.0,
+                        help="Stream mode: length of each classified window.")
+    parser.add_argument("--hop-seconds", type=float, default=1.0,
+                        help="Stream mode: distance between the starts of consecutive windows, "
+                             "rounded to the nearest whole STFT hop (1.0 becomes 0.992).")
+    parser.add_argument("--timings", action="store_true",
+                        help="Add per-stage latency, peak RSS and torch thread count to each result.")
+    parser.add_argument("--prefilter", type=str, default=None,
+                        help="Thresholds JSON from --calibrate-prefilter; trivial clips skip the model.")
+    parser.add_argument("--calibrate-prefilter", action="store_true",
+                        help="With --dir/--manifest: fit prefilter thresholds and write them to --output "
+                             "(default: prefilter.json).")
+    parser.add_argument("--max-recall-loss", type=float, default=0.01,
+                        help="Calibration: largest fraction of car_crash/glass_break clips the prefilter may skip.")
+    parser.add_argument("--dir", type=str, default=None,
+                        help="Classify every audio file under this dataset directory.")
+    parser.add_argument("--manifest", type=str, default=None,
+                        help="Classify the audio files listed in this manifest, one path per line.")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Dataset mode: JSONL results file, appended to and resumed from "
+                             "(default: predictions.jsonl).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Dataset mode: decoding processes (default: CPU count).")
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="Dataset mode: clips per forward pass.")
+    parser.add_argument("--max-batch-size", type=int, default=16,
+                        help="Daemon mode: largest number of clips classified in one forward pass.")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                        help="Daemon mode: longest time a clip waits for a batch to fill up.")
+    parser.add_argument("--max-queue-depth", type=int, default=256,
+                        help="Daemon mode: clips allowed to wait before new requests are rejected.")
 
     args = parser.parse_args()
 
@@ -118,10 +1497,55 @@ if __name__ == "__main__":
         print(json.dumps({"error": f"Model file not found: {args.model_path}"}), file=sys.stderr)
         sys.exit(1)
 
-    if not os.path.exists(args.audio_path):
-        print(json.dumps({"error": f"Audio file not found: {args.audio_path}"}), file=sys.stderr)
+    if args.prefilter:
+        PREFILTER = load_prefilter(args.prefilter)
+
+    if args.serve:
+        sys.exit(serve(args.model_path, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                       max_queue_depth=args.max_queue_depth, prefilter=PREFILTER))
+
+    if args.dir or args.manifest:
+        paths = list_dataset_dir(args.dir) if args.dir else read_manifest(args.manifest)
+        if args.calibrate_prefilter:
+            calibration = calibrate_prefilter(paths, max_recall_loss=args.max_recall_loss, workers=args.workers)
+            with open(args.output or "prefilter.json", "w") as f:
+                json.dump(calibration, f, indent=2)
+            print(json.dumps(calibration, indent=2))
+            sys.exit(0)
+        summary = classify_dataset(args.model_path, paths, args.output or "predictions.jsonl",
+                                   workers=args.workers, batch_size=args.batch_size, prefilter=PREFILTER)
+        print(json.dumps(summary, indent=2))
+        sys.exit(0)
+
+    if not args.audio_paths:
+        parser.error("at least one audio path is required unless --serve, --dir or --manifest is given")
+
+    if args.stream:
+        for audio_path in args.audio_paths:
+            if not os.path.exists(audio_path):
+                print(json.dumps({"error": f"Audio file not found: {audio_path}"}), file=sys.stderr)
+                sys.exit(1)
+            for window_result in predict_stream(args.model_path, audio_path, window_seconds=args.window_seconds,
+                                                hop_seconds=args.hop_seconds):
+                window_result["audio_path"] = audio_path
+                print(json.dumps(window_result), flush=True)
+        sys.exit(0)
+
+    if len(args.audio_paths) > 1:
+        # Batch mode: a missing file is reported in its own slot
+        print(json.dumps(predict_batch(args.model_path, args.audio_paths, timings=args.timings)))
+        sys.exit(0)
+
+    audio_path = args.audio_paths[0]
+    if audio_path == "-":
+        # Encoded audio piped on stdin
+        print(json.dumps(predict(args.model_path, sys.stdin.buffer.read(), timings=args.timings)))
+        sys.exit(0)
+
+    if not os.path.exists(audio_path):
+        print(json.dumps({"error": f"Audio file not found: {audio_path}"}), file=sys.stderr)
         sys.exit(1)
 
     # Get prediction and print as JSON
-    prediction_result = predict(args.model_path, args.audio_path)
+    prediction_result = predict(args.model_path, audio_path, timings=args.timings)
     print(json.dumps(prediction_result))
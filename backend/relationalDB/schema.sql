@@ -215,6 +215,20 @@ CREATE TABLE IF NOT EXISTS device_telemetry_summary (
     metadata JSONB -- Additional flexible telemetry data
 );
 
+-- 16. simulated_car_telemetry Table
+-- Batched telemetry from the CARLA bridge; positions are world coordinates in meters
+CREATE TABLE IF NOT EXISTS simulated_car_telemetry (
+    telemetry_id BIGSERIAL PRIMARY KEY,
+    car_id VARCHAR(100) NOT NULL, -- CARLA bridge car ID
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    location_x DOUBLE PRECISION, -- Meters
+    location_y DOUBLE PRECISION, -- Meters
+    speed REAL -- km/h
+);
+
+CREATE INDEX IF NOT EXISTS idx_simulated_car_telemetry_car_time
+ON simulated_car_telemetry (car_id, timestamp);
+
 -- Enhance iot_devices table with firmware and certificate support
 ALTER TABLE iot_devices
 ADD COLUMN IF NOT EXISTS current_firmware_id INTEGER REFERENCES device_firmware(firmware_id) ON DELETE SET NULL,
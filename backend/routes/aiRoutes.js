@@ -1,35 +1,16 @@
 const express = require("express");
 const multer = require("multer");
-const path = require("path");
-const os = require("os");
-const { processAudio } = require("../controllers/aiController");
-const { authMiddleware } = require("./helper");
+const { processAudio, getAiHealth } = require("../controllers/aiController");
+const { serviceTokenMiddleware } = require("./helper");
 
 const router = express.Router();
 
-// Configure multer for temporary file storage
-// It will save uploaded files to the system's temporary directory
-const upload = multer({ dest: os.tmpdir() });
-
-/**
- * Service token middleware for CARLA bridge and other services
- * Allows service-to-service communication without user JWT
- */
-const serviceTokenMiddleware = (req, res, next) => {
-	const serviceToken =
-		req.headers["x-service-token"] || req.body.serviceToken;
-	const expectedToken =
-		process.env.SERVICE_TOKEN || "carla-bridge-service-token";
-
-	if (serviceToken === expectedToken) {
-		// Create a mock user object for service requests
-		req.user = { id: "service", role: "Service" };
-		return next();
-	}
-
-	// If no service token, fall back to regular auth
-	return authMiddleware(req, res, next);
-};
+// Keep uploads in memory; the clip is streamed straight to the inference
+// daemon instead of taking a round trip through a temporary file
+const upload = multer({
+	storage: multer.memoryStorage(),
+	limits: { fileSize: 25 * 1024 * 1024 },
+});
 
 /**
  * @route   POST /api/ai/process-audio
@@ -45,4 +26,11 @@ router.post(
 	processAudio
 );
 
+/**
+ * @route   GET /api/ai/health
+ * @desc    Reports uptime and request counters of the inference daemon.
+ * @access  Private (JWT or Service Token)
+ */
+router.get("/health", serviceTokenMiddleware, getAiHealth);
+
 module.exports = router;
@@ -45,4 +45,24 @@ const authMiddleware = async (req, res, next) => {
 	}
 };
 
-module.exports = { authMiddleware };
+/**
+ * Service token middleware for CARLA bridge and other services
+ * Allows service-to-service communication without user JWT
+ */
+const serviceTokenMiddleware = (req, res, next) => {
+	const serviceToken =
+		req.headers["x-service-token"] || (req.body && req.body.serviceToken);
+	const expectedToken =
+		process.env.SERVICE_TOKEN || "carla-bridge-service-token";
+
+	if (serviceToken === expectedToken) {
+		// Create a mock user object for service requests
+		req.user = { id: "service", role: "Service" };
+		return next();
+	}
+
+	// If no service token, fall back to regular auth
+	return authMiddleware(req, res, next);
+};
+
+module.exports = { authMiddleware, serviceTokenMiddleware };
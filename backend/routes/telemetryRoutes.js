@@ -0,0 +1,37 @@
+const express = require("express");
+const router = express.Router();
+
+const { serviceTokenMiddleware } = require("./helper");
+const {
+	decodeTelemetryBatch,
+	storeTelemetryBatch,
+} = require("../services/telemetryService");
+
+/**
+ * @route   POST /api/telemetry/batch
+ * @desc    Ingests a delta-encoded (optionally gzip-compressed) telemetry batch from the CARLA bridge.
+ * @access  Private (JWT or Service Token)
+ */
+router.post("/batch", serviceTokenMiddleware, async (req, res) => {
+	let rows;
+	try {
+		rows = decodeTelemetryBatch(req.body);
+	} catch (error) {
+		return res.status(400).json({ message: error.message });
+	}
+
+	try {
+		const stored = await storeTelemetryBatch(rows);
+		res.status(201).json({
+			message: "Telemetry batch stored successfully",
+			stored,
+		});
+	} catch (error) {
+		console.error("Store Telemetry Batch Error:", error.message);
+		res.status(500).json({
+			message: "Failed to store telemetry batch due to server error.",
+		});
+	}
+});
+
+module.exports = router;
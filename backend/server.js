@@ -17,10 +17,12 @@ const deviceRouter = require("./routes/deviceRoutes");
 const serviceRequestRouter = require("./routes/serviceRequestRoutes");
 const userRoutes = require("./routes/userRoutes");
 const aiRouter = require("./routes/aiRoutes");
+const telemetryRouter = require("./routes/telemetryRoutes");
 
 // Import Services
 const mqttService = require("./services/mqttService");
 const authService = require("./services/authService");
+const { stopInferenceDaemon } = require("./services/aiService");
 
 const app = express();
 
@@ -159,6 +161,7 @@ app.use("/api/devices", requireJWTAuth, deviceRouter);
 app.use("/api/serviceRequests", requireJWTAuth, serviceRequestRouter);
 app.use("/api/user", requireJWTAuth, userRoutes);
 app.use("/api/ai", aiRouter); // AI routes handle their own auth (JWT or service token)
+app.use("/api/telemetry", telemetryRouter); // Telemetry ingest handles its own auth (JWT or service token)
 
 // --- Public Routes ---
 app.use("/api/auth", authRouter);
@@ -186,3 +189,17 @@ server.listen(PORT, async () => {
 		console.log(`(Server will continue without MQTT support)`);
 	}
 });
+
+// --- Graceful Shutdown ---
+const SHUTDOWN_TIMEOUT_MS = 5000;
+
+function shutdown(signal) {
+	console.log(`${signal} received, shutting down...`);
+	// Lets the inference daemon finish queued clips and exit on its own
+	stopInferenceDaemon();
+	server.close(() => process.exit(0));
+	setTimeout(() => process.exit(0), SHUTDOWN_TIMEOUT_MS).unref();
+}
+
+process.on("SIGINT", () => shutdown("SIGINT"));
+process.on("SIGTERM", () => shutdown("SIGTERM"));
@@ -1,27 +1,247 @@
 const { spawn } = require("child_process");
 const path = require("path");
+const readline = require("readline");
 
 // Configuration for the Python script and model
 // the Python script and model are in a 'ml' subfolder of the backend
 const PYTHON_SCRIPT_PATH = path.join(__dirname, "..", "ml", "predict.py");
-const MODEL_PATH = path.join(__dirname, "..", "ml", "accident_model.pth");
+// AI_MODEL_PATH may point at the optimized TorchScript build from ml/optimize_model.py
+const MODEL_PATH =
+	process.env.AI_MODEL_PATH ||
+	path.join(__dirname, "..", "ml", "accident_model.pth");
 const PYTHON_EXECUTABLE = process.env.PYTHON_EXECUTABLE || "python";
 
+// Set AI_INFERENCE_DAEMON=false to fall back to one Python process per clip
+const USE_INFERENCE_DAEMON = process.env.AI_INFERENCE_DAEMON !== "false";
+const DAEMON_REQUEST_TIMEOUT_MS = parseInt(
+	process.env.AI_DAEMON_REQUEST_TIMEOUT_MS || "30000",
+	10
+);
+const DAEMON_MAX_RESTART_DELAY_MS = 30000;
+// After a request times out, the daemon must answer a health probe this fast
+const DAEMON_PROBE_TIMEOUT_MS = 5000;
+// Micro-batching limits for concurrent requests inside the daemon
+const DAEMON_BATCH_ARGS = [
+	"--max-batch-size",
+	process.env.AI_MAX_BATCH_SIZE || "16",
+	"--max-wait-ms",
+	process.env.AI_MAX_BATCH_WAIT_MS || "5",
+	"--max-queue-depth",
+	process.env.AI_MAX_QUEUE_DEPTH || "256",
+];
+
 /**
- * Analyzes an audio file by calling the Python prediction script.
- * @param {string} audioFilePath - The absolute path to the audio file to be analyzed.
+ * Long-lived predict.py process (started with --serve) that keeps the model
+ * loaded between requests. Requests and responses are newline-delimited JSON
+ * matched by id. A request that times out is rejected on its own; the daemon
+ * is only killed if it then fails a health probe. If the process dies,
+ * pending requests are rejected and the daemon is restarted with exponential
+ * backoff on the next request.
+ */
+class InferenceDaemon {
+	constructor() {
+		this.process = null;
+		this.ready = null;
+		this.pending = new Map();
+		this.nextId = 1;
+		this.restarts = 0;
+		this.restartAt = 0;
+		this.stopping = false;
+		this.probing = false;
+	}
+
+	start() {
+		if (this.ready) {
+			return this.ready;
+		}
+
+		const delay = Math.max(0, this.restartAt - Date.now());
+		this.ready = new Promise((resolve, reject) => {
+			setTimeout(() => this._spawn(resolve, reject), delay);
+		});
+		// Allow a failed start to be retried by the next request
+		this.ready.catch(() => {
+			this.ready = null;
+		});
+		return this.ready;
+	}
+
+	_spawn(resolve, reject) {
+		const child = spawn(PYTHON_EXECUTABLE, [
+			PYTHON_SCRIPT_PATH,
+			MODEL_PATH,
+			"--serve",
+			...DAEMON_BATCH_ARGS,
+		]);
+		this.process = child;
+		let started = false;
+
+		const lines = readline.createInterface({ input: child.stdout });
+		lines.on("line", (line) => {
+			let message;
+			try {
+				message = JSON.parse(line);
+			} catch (e) {
+				console.warn(`[aiService] Ignoring non-JSON daemon output: ${line}`);
+				return;
+			}
+
+			if (message.event === "ready") {
+				started = true;
+				this.restarts = 0;
+				console.log(`[aiService] Inference daemon ready (pid ${message.pid})`);
+				return resolve(child);
+			}
+			if (message.event === "error") {
+				return reject(new Error(`Inference daemon failed to start: ${message.error}`));
+			}
+
+			const entry = this.pending.get(message.id);
+			if (!entry) {
+				return;
+			}
+			this.pending.delete(message.id);
+			clearTimeout(entry.timer);
+			if (message.error) {
+				entry.reject(new Error(message.error));
+			} else {
+				entry.resolve(message.result);
+			}
+		});
+
+		// Writing to a daemon that already exited raises EPIPE here rather than throwing
+		child.stdin.on("error", (err) => {
+			console.warn(`[aiService] Inference daemon stdin error: ${err.message}`);
+			this._rejectPending(
+				new Error(`Inference daemon is not accepting requests: ${err.message}`)
+			);
+			child.kill();
+		});
+
+		child.stderr.on("data", (data) => {
+			console.warn(`[aiService] Inference daemon stderr: ${data.toString()}`);
+		});
+
+		child.on("error", (err) => {
+			reject(new Error(`Failed to start inference daemon: ${err.message}`));
+		});
+
+		child.on("close", (code) => {
+			if (this.process === child) {
+				this.process = null;
+				this.ready = null;
+			}
+			const error = new Error(`Inference daemon exited with code ${code}`);
+			this._rejectPending(error);
+
+			if (!started) {
+				reject(error);
+			}
+			if (!this.stopping) {
+				this.restarts += 1;
+				const backoff = Math.min(
+					DAEMON_MAX_RESTART_DELAY_MS,
+					500 * 2 ** (this.restarts - 1)
+				);
+				this.restartAt = Date.now() + backoff;
+				console.warn(
+					`[aiService] Inference daemon exited with code ${code}, restarting in ${backoff}ms on next request`
+				);
+			}
+		});
+	}
+
+	_rejectPending(error) {
+		for (const entry of this.pending.values()) {
+			clearTimeout(entry.timer);
+			entry.reject(error);
+		}
+		this.pending.clear();
+		this.probing = false;
+	}
+
+	// Only a daemon that cannot answer a health request is killed, so one slow
+	// request does not fail everything else in flight
+	_probe(child) {
+		if (this.probing || this.process !== child) {
+			return;
+		}
+		this.probing = true;
+		const id = this.nextId++;
+		const done = () => {
+			this.probing = false;
+		};
+		const timer = setTimeout(() => {
+			this.pending.delete(id);
+			this.probing = false;
+			console.warn(
+				`[aiService] Inference daemon did not answer a health probe within ${DAEMON_PROBE_TIMEOUT_MS}ms, restarting`
+			);
+			child.kill();
+		}, DAEMON_PROBE_TIMEOUT_MS);
+		this.pending.set(id, { resolve: done, reject: done, timer });
+		child.stdin.write(JSON.stringify({ id, cmd: "health" }) + "\n");
+	}
+
+	async request(cmd, payload = {}, audioBuffer = null) {
+		const child = await this.start();
+		const id = this.nextId++;
+
+		return new Promise((resolve, reject) => {
+			const timer = setTimeout(() => {
+				this.pending.delete(id);
+				reject(new Error(`Inference daemon timed out after ${DAEMON_REQUEST_TIMEOUT_MS}ms`));
+				this._probe(child);
+			}, DAEMON_REQUEST_TIMEOUT_MS);
+
+			this.pending.set(id, { resolve, reject, timer });
+			if (audioBuffer) {
+				// Length-prefixed payload: the raw clip follows the request line
+				child.stdin.write(
+					JSON.stringify({ id, cmd, ...payload, audio_bytes: audioBuffer.length }) + "\n"
+				);
+				child.stdin.write(audioBuffer);
+			} else {
+				child.stdin.write(JSON.stringify({ id, cmd, ...payload }) + "\n");
+			}
+		});
+	}
+
+	stop() {
+		this.stopping = true;
+		if (this.process) {
+			this.process.stdin.end(JSON.stringify({ id: 0, cmd: "shutdown" }) + "\n");
+		}
+	}
+}
+
+const daemon = new InferenceDaemon();
+
+/**
+ * Analyzes an audio clip by spawning a one-off Python prediction process.
+ * @param {string|Buffer} audio - Absolute path to the audio file, or the encoded clip itself.
  * @returns {Promise<object>} A promise that resolves with the prediction result object from the Python script.
  */
-function analyzeAudio(audioFilePath) {
+function analyzeAudioOnce(audio) {
 	return new Promise((resolve, reject) => {
+		const isBuffer = Buffer.isBuffer(audio);
 		const process = spawn(PYTHON_EXECUTABLE, [
 			PYTHON_SCRIPT_PATH,
 			MODEL_PATH,
-			audioFilePath,
+			isBuffer ? "-" : audio,
 		]);
 
 		let stdoutData = "";
 		let stderrData = "";
+		let stdinError = null;
+
+		// A script that exits before reading the clip turns this write into EPIPE
+		process.stdin.on("error", (err) => {
+			stdinError = err;
+		});
+		if (isBuffer) {
+			process.stdin.end(audio);
+		}
 
 		// Listen for data from the script's standard output
 		process.stdout.on("data", (data) => {
@@ -36,8 +256,11 @@ function analyzeAudio(audioFilePath) {
 		// script finishing
 		process.on("close", (code) => {
 			// script exited with error
-			if (code !== 0) {
-				const errorMsg = `Python script exited with code ${code}. Stderr: ${stderrData}`;
+			if (code !== 0 || stdinError) {
+				let errorMsg = `Python script exited with code ${code}. Stderr: ${stderrData}`;
+				if (stdinError) {
+					errorMsg += ` (failed to send audio: ${stdinError.message})`;
+				}
 				return reject(new Error(errorMsg));
 			}
 
@@ -69,6 +292,54 @@ function analyzeAudio(audioFilePath) {
 	});
 }
 
+/**
+ * Analyzes an audio clip using the persistent inference daemon.
+ * @param {string|Buffer} audio - Absolute path to the audio file, or the encoded clip itself.
+ * @returns {Promise<object>} A promise that resolves with the prediction result object.
+ */
+async function analyzeAudio(audio) {
+	if (!USE_INFERENCE_DAEMON) {
+		return analyzeAudioOnce(audio);
+	}
+
+	const result = Buffer.isBuffer(audio)
+		? await daemon.request("predict", {}, audio)
+		: await daemon.request("predict", { audio_path: audio });
+	if (result.error) {
+		throw new Error(`Prediction script returned an error: ${result.error}`);
+	}
+	return result;
+}
+
+/**
+ * Analyzes several audio files in a single batched forward pass.
+ * @param {string[]} audioFilePaths - Absolute paths to the audio files.
+ * @returns {Promise<object[]>} One result per path, in order. Clips that fail
+ * to decode carry an `error` field instead of a prediction.
+ */
+function analyzeAudioBatch(audioFilePaths) {
+	return daemon.request("predict_batch", { audio_paths: audioFilePaths });
+}
+
+/**
+ * Reports the status of the inference daemon.
+ * @returns {Promise<object>} Uptime and request counters from the daemon.
+ */
+function getInferenceHealth() {
+	return daemon.request("health");
+}
+
+/**
+ * Stops the inference daemon, e.g. on server shutdown.
+ */
+function stopInferenceDaemon() {
+	daemon.stop();
+}
+
 module.exports = {
 	analyzeAudio,
+	analyzeAudioBatch,
+	analyzeAudioOnce,
+	getInferenceHealth,
+	stopInferenceDaemon,
 };
@@ -150,7 +150,95 @@ async function updateTelemetrySummary(deviceId) {
 	}
 }
 
+/**
+ * Decode a delta-encoded telemetry batch from the CARLA bridge
+ * Each car's columns (t, lat, lon, speed) are integer deltas at the batch's
+ * fixed-point scales; the running sum gives the absolute values.
+ * @param {Object} batch - Batch body ({ v, t0, scales, cars })
+ * @returns {Object} - Column arrays ready for a bulk insert
+ */
+function decodeTelemetryBatch(batch) {
+	if (!batch || batch.v !== 1 || !batch.cars || typeof batch.cars !== "object") {
+		throw new Error("Unsupported telemetry batch format");
+	}
+
+	const { t0, scales, cars } = batch;
+	const rows = {
+		carIds: [],
+		timestamps: [],
+		latitudes: [],
+		longitudes: [],
+		speeds: [],
+	};
+
+	for (const [carId, columns] of Object.entries(cars)) {
+		const length = columns.t.length;
+		if (["lat", "lon", "speed"].some((c) => columns[c].length !== length)) {
+			throw new Error(`Telemetry columns for ${carId} have different lengths`);
+		}
+
+		let t = 0;
+		let lat = 0;
+		let lon = 0;
+		let speed = 0;
+		for (let i = 0; i < length; i++) {
+			t += columns.t[i];
+			lat += columns.lat[i];
+			lon += columns.lon[i];
+			speed += columns.speed[i];
+			rows.carIds.push(carId);
+			rows.timestamps.push(t0 + t / scales.t);
+			rows.latitudes.push(lat / scales.lat);
+			rows.longitudes.push(lon / scales.lon);
+			rows.speeds.push(speed / scales.speed);
+		}
+	}
+
+	return rows;
+}
+
+/**
+ * Store a batch of simulated car telemetry in a single insert
+ * The bridge's lat/lon are CARLA world y/x in meters, not geo coordinates, so
+ * they go into simulated_car_telemetry rather than device_telemetry_summary.
+ * @param {Object} rows - Decoded batch from decodeTelemetryBatch
+ * @returns {number} - Number of stored records
+ */
+async function storeTelemetryBatch(rows) {
+	try {
+		if (rows.carIds.length === 0) {
+			return 0;
+		}
+
+		const result = await pgPool.query(
+			`INSERT INTO simulated_car_telemetry
+			(car_id, timestamp, location_x, location_y, speed)
+			SELECT u.car_id, to_timestamp(u.ts), u.x, u.y, u.speed
+			FROM unnest($1::text[], $2::float8[], $3::float8[], $4::float8[], $5::float4[])
+			     AS u(car_id, ts, y, x, speed)`,
+			[
+				rows.carIds,
+				rows.timestamps,
+				rows.latitudes,
+				rows.longitudes,
+				rows.speeds,
+			]
+		);
+
+		console.log(
+			`[Telemetry Service] Stored batch of ${result.rowCount} telemetry records`
+		);
+
+		return result.rowCount;
+	} catch (error) {
+		console.error("Error storing telemetry batch:", error.message);
+		throw error;
+	}
+}
+
 module.exports = {
+	decodeTelemetryBatch,
+	storeTelemetryBatch,
 	storeTelemetry,
 	getTelemetry,
 	updateTelemetrySummary,